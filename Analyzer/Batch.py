@@ -0,0 +1,229 @@
+"""
+Headless batch solver for .sys files.
+
+Usage (from the repository root):
+    python -m Analyzer.Batch "systems/**/*.sys" --timeout 60 --workers 8 > results.jsonl
+    python -m Analyzer.Batch systems/ --engine graph
+    python -m Analyzer.Batch systems/ --engine graph --periodic
+
+Every argument is a .sys file, a directory (searched recursively for .sys files) or a glob pattern. One JSON line
+is written to stdout per system as soon as it is solved, the log of the solvers goes to stderr.
+
+--periodic makes the graph engine search the per robot decomposition of every system (a PeriodicSystem, whose size
+is the sum of the robots' periods) instead of its product Kripke structure, which is then never generated.
+
+--timeout covers everything done for a file: loading, generating the Kripke structure, encoding and solving. The
+engines give up by themselves at the deadline, and a worker still busy with a file GRACE_SEC seconds past it is
+killed, the file being reported as a timeout.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+from z3 import sat
+
+from Services.BoundSearch import find_shortest_path, LINEAR, GALLOPING
+from Services.FileManager import close_system, load_system
+from Services.GraphSearch import shortest_path
+from Services.KripkeGenerator import generate_from_system, generate_periodic_system
+from Services.Logging import configure
+
+ENGINES = ("sat", "graph")
+# Time given to a worker past the timeout of its file (e.g. to start, or to leave a Z3 call) before it is killed
+GRACE_SEC = 5.0
+# Interval of the checks of the running files
+POLL_SEC = 0.05
+
+
+def expand_paths(patterns):
+    """
+    Expand the command line arguments into .sys files.
+
+    Args:
+        patterns (list): Files, directories or glob patterns.
+
+    Returns:
+        list: The sorted paths of the .sys files, without duplicates.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(glob.glob(os.path.join(pattern, "**", "*.sys"), recursive=True))
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def solve_file(path, engine, strategy, max_k, timeout_sec, periodic=False):
+    """
+    Load and solve a single system file, in a worker process.
+
+    Args:
+        path (str): The path of the .sys file.
+        engine (str): "sat" (BoundSearch on Z3) or "graph" (GraphSearch).
+        strategy (str): The bound search strategy of the sat engine, LINEAR or GALLOPING.
+        max_k (int): The last path length to check, or None for n * n.
+        timeout_sec (float): Timeout of the whole system (loading included) in seconds, or None for no timeout.
+        periodic (bool): Whether the graph engine searches the PeriodicSystem of the robots (legacy files, which
+            only hold the Kripke structure, use it instead).
+
+    Returns:
+        dict: The result record of the system.
+    """
+    start = time.perf_counter()
+    deadline = None if timeout_sec is None else time.monotonic() + timeout_sec
+    record = {"path": path}
+    kripke = None
+    try:
+        system, n, kripke = load_system(path)
+        if periodic and system is not None:
+            M2 = generate_periodic_system(system, n)
+        else:
+            M2 = kripke if kripke is not None else generate_from_system(system, n)
+        max_k = max_k if max_k is not None else n * n
+        record.update({"n": n, "max_k": max_k})
+        if deadline is not None and time.monotonic() >= deadline:
+            status, solution, k = "timeout", [], None
+        elif engine == "graph":
+            status, solution, k = shortest_path(n, M2, max_k, deadline=deadline)
+        else:
+            status, solution, k = find_shortest_path(n, M2, (2 * n) - 1, max_k, strategy, deadline=deadline)
+        record.update({"status": str(status), "k": k if status == sat else None,
+                       "solution": [list(position) for position in solution]})
+    except Exception as error:
+        record.update({"status": "error", "error": f"{type(error).__name__}: {error}"})
+    finally:
+        close_system(kripke)
+    record["elapsed_sec"] = time.perf_counter() - start
+    return record
+
+
+def solve_args(args):
+    """
+    Unpack the arguments of solve_file, for the pool's imap.
+
+    Args:
+        args (tuple): The arguments of solve_file.
+
+    Returns:
+        dict: The result record of the system.
+    """
+    return solve_file(*args)
+
+
+def timeout_record(path, elapsed_sec):
+    """
+    Get the record of a file whose worker was killed.
+
+    Args:
+        path (str): The path of the .sys file.
+        elapsed_sec (float): The time the file ran for.
+
+    Returns:
+        dict: The result record of the file.
+    """
+    return {"path": path, "status": "timeout", "k": None, "solution": [], "elapsed_sec": elapsed_sec}
+
+
+def run_jobs(jobs, workers, timeout_sec, log_level):
+    """
+    Solve the files on a process pool, killing the workers that overrun their file's timeout.
+
+    At most one file per worker is handed to the pool at a time, so a file starts as soon as it is submitted and
+    its time can be measured from there. If a file runs GRACE_SEC seconds past its timeout, the pool is replaced
+    and the other running files are submitted again.
+
+    Args:
+        jobs (list): The arguments of solve_file of every file.
+        workers (int): Number of worker processes.
+        timeout_sec (float): Timeout of every file in seconds, or None for no timeout.
+        log_level (str): The log level of the workers.
+
+    Yields:
+        dict: The result record of every file, as soon as it is available.
+    """
+    queue = deque(jobs)
+    running = []
+    # Spawned workers do not inherit the Z3 context of the parent
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(workers, configure, (log_level,))
+    try:
+        while queue or running:
+            while queue and len(running) < workers:
+                job = queue.popleft()
+                running.append((pool.apply_async(solve_args, (job,)), job, time.monotonic()))
+            running[0][0].wait(POLL_SEC)
+
+            still_running = []
+            overrun = False
+            for result, job, started in running:
+                elapsed = time.monotonic() - started
+                if result.ready():
+                    try:
+                        yield result.get()
+                    except Exception as error:
+                        yield {"path": job[0], "status": "error", "error": f"{type(error).__name__}: {error}",
+                               "elapsed_sec": elapsed}
+                elif timeout_sec is not None and elapsed > timeout_sec + GRACE_SEC:
+                    overrun = True
+                    yield timeout_record(job[0], elapsed)
+                else:
+                    still_running.append((result, job, started))
+            running = still_running
+
+            if overrun:
+                # The stuck worker cannot be stopped alone, the files of the other workers start over
+                pool.terminate()
+                pool = context.Pool(workers, configure, (log_level,))
+                queue.extendleft(reversed([job for _, job, _ in running]))
+                running = []
+    finally:
+        pool.terminate()
+
+
+def main(argv=None):
+    """
+    Main entry point of the batch solver.
+
+    Args:
+        argv (list): The command line arguments, or None for sys.argv.
+
+    Returns:
+        int: The exit code, 1 if a system could not be loaded or solved, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Solve .sys files without the GUI, one JSON line per system.")
+    parser.add_argument("paths", nargs="+", help=".sys files, directories or glob patterns")
+    parser.add_argument("--engine", choices=ENGINES, default="sat", help="solving engine (default sat)")
+    parser.add_argument("--strategy", choices=(LINEAR, GALLOPING), default=GALLOPING,
+                        help="bound search strategy of the sat engine (default galloping)")
+    parser.add_argument("--periodic", action="store_true",
+                        help="search the per robot decomposition of the systems (graph engine only)")
+    parser.add_argument("--max-k", type=int, default=None, help="last path length to check (default n * n)")
+    parser.add_argument("--timeout", type=float, default=None, help="timeout of every system in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default the number of CPUs)")
+    parser.add_argument("--log-level", default="WARNING", help="log level of the solvers on stderr (default WARNING)")
+    args = parser.parse_args(argv)
+    if args.periodic and args.engine != "graph":
+        parser.error("--periodic requires --engine graph")
+
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("No .sys files found", file=sys.stderr)
+        return 1
+
+    jobs = [(path, args.engine, args.strategy, args.max_k, args.timeout, args.periodic) for path in paths]
+    workers = min(args.workers or os.cpu_count() or 1, len(jobs))
+    failed = False
+    for record in run_jobs(jobs, workers, args.timeout, args.log_level):
+        failed = failed or record["status"] == "error"
+        print(json.dumps(record), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Benchmark runner for the generation, formula building and solving phases.
+
+Usage (from the repository root):
+    python -m Analyzer.Benchmark run --n 10 20 --agents 1 2 --stray 5 --seeds 0 1 2 --max-k 60 --out run.json
+    python -m Analyzer.Benchmark compare baseline.json run.json --threshold 0.1
+    python -m Analyzer.Benchmark run --n 20 --engine scratch incremental --out run.json --profile profile.prom
+
+Results are written as JSON (one record per system, with the per bound timings) or as CSV
+(one row per system and bound) depending on the extension of --out. --profile writes the time of every phase of the
+formula building and the Z3 statistics of the checks, in the Prometheus text format if the file ends with .prom and
+as a text report otherwise.
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+
+from z3 import unsat
+
+from Services.CNFEncoder import encode
+from Services.Formulizer import formulise, count_variables
+from Services.KripkeGenerator import auto_generate_system
+from Services.Logging import configure
+from Services.Profiler import Profiler, phase, count
+from Services.SatBackend import Z3SatBackend
+from Services.Solver import IncrementalSolver, make_solver, check, report_check
+
+ENGINES = ("scratch", "incremental", "cnf")
+CASE_KEYS = ("n", "agents", "stay_chance", "stray_radius", "seed", "engine")
+
+
+def run_case(n, agents, stay_chance, stray_radius, seed, max_k, engine, timeout_sec=None, profiler=None):
+    """
+    Generate a system and solve it with increasing bounds, timing every phase separately.
+
+    Args:
+        n (int): Size of the grid.
+        agents (int): Number of counter agents.
+        stay_chance (float): Probability of staying in the same position.
+        stray_radius (int): Maximum radius for straying from the initial position.
+        seed (int): Seed of the system generator.
+        max_k (int): The last path length to check.
+        engine (str): "scratch" (Solver.Solve per bound), "incremental" (IncrementalSolver) or "cnf" (CNFEncoder
+            on Z3's SAT core).
+        timeout_sec (float): Timeout of every check in seconds, or None for no timeout.
+        profiler (Profiler): Profiler of the phases and checks, or None.
+
+    Returns:
+        dict: The parameters of the case, the generation time, and the timings and formula sizes of every bound.
+    """
+    record = {"n": n, "agents": agents, "stay_chance": stay_chance, "stray_radius": stray_radius, "seed": seed,
+              "engine": engine, "max_k": max_k}
+
+    start = time.perf_counter()
+    system, M2 = auto_generate_system(n, agents, stay_chance, stray_radius, seed=seed)
+    record["generate_sec"] = time.perf_counter() - start
+    record["kripke_states"] = len(M2.nodes)
+
+    bmc = IncrementalSolver(n, M2, profiler=profiler) if engine == "incremental" else None
+    backend = Z3SatBackend(None if timeout_sec is None else int(timeout_sec * 1000)) if engine == "cnf" else None
+    bounds = []
+    status = unsat
+    for k in range((2 * n) - 1, max_k + 1):
+        bound = {"k": k}
+        start = time.perf_counter()
+        if engine == "scratch":
+            clauses = formulise(M2, n, k, profiler=profiler)
+            bound["formulise_sec"] = time.perf_counter() - start
+            bound["variables"] = count_variables(M2, n, k)
+            bound["clauses"] = len(clauses)
+            start = time.perf_counter()
+            solver = make_solver()
+            with phase(profiler, "solver_add"):
+                solver.add(*clauses)
+            with phase(profiler, "check"):
+                status = check(solver, timeout_sec=timeout_sec)
+            report_check(solver, k, status, time.perf_counter() - start, profiler=profiler)
+        elif engine == "incremental":
+            bmc.extend(k)
+            bound["formulise_sec"] = time.perf_counter() - start
+            bound["variables"] = bmc.num_variables
+            bound["clauses"] = bmc.num_constraints
+            start = time.perf_counter()
+            status = bmc.solve(k, timeout_sec=timeout_sec)[0]
+        elif engine == "cnf":
+            with phase(profiler, "encode"):
+                cnf, var_map = encode(M2, n, k)
+            count(profiler, "encode", cnf.num_clauses)
+            bound["formulise_sec"] = time.perf_counter() - start
+            bound["variables"] = cnf.num_vars
+            bound["clauses"] = cnf.num_clauses
+            start = time.perf_counter()
+            with phase(profiler, "check"):
+                status = backend.solve(cnf)[0]
+            report_check(None, k, status, time.perf_counter() - start, profiler=profiler)
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+        bound["solve_sec"] = time.perf_counter() - start
+        bound["status"] = str(status)
+        bounds.append(bound)
+        if status != unsat:
+            break
+
+    record["bounds"] = bounds
+    record["status"] = str(status)
+    record["k"] = bounds[-1]["k"] if bounds else None
+    record["formulise_sec"] = sum(bound["formulise_sec"] for bound in bounds)
+    record["solve_sec"] = sum(bound["solve_sec"] for bound in bounds)
+    return record
+
+
+def run(args):
+    """
+    Run every case of the parameter grid and write the results.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments of the run command.
+    """
+    records = []
+    profiler = Profiler() if args.profile else None
+    for n, agents, stay_chance, stray_radius, seed, engine in itertools.product(
+            args.n, args.agents, args.stay, args.stray, args.seeds, args.engine):
+        max_k = args.max_k if args.max_k is not None else n * n
+        record = run_case(n, agents, stay_chance, stray_radius, seed, max_k, engine, args.timeout, profiler)
+        records.append(record)
+        print(f"n={n} agents={agents} stay={stay_chance} stray={stray_radius} seed={seed} engine={engine}: "
+              f"{record['status']} k={record['k']} gen={record['generate_sec']:.3f}s "
+              f"formulise={record['formulise_sec']:.3f}s solve={record['solve_sec']:.3f}s", file=sys.stderr)
+
+    if args.out.endswith(".csv"):
+        write_csv(args.out, records)
+    else:
+        with open(args.out, "w", encoding="utf-8") as out_file:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": records}, out_file, indent=1)
+
+    if profiler is not None:
+        with open(args.profile, "w", encoding="utf-8") as profile_file:
+            profile_file.write(profiler.prometheus() if args.profile.endswith(".prom") else profiler.report() + "\n")
+
+
+def write_csv(path, records):
+    """
+    Write the results as CSV, one row per system and bound.
+
+    Args:
+        path (str): The path of the CSV file.
+        records (list): The records returned by run_case.
+    """
+    header = list(CASE_KEYS) + ["generate_sec", "kripke_states", "k", "variables", "clauses", "formulise_sec",
+                                "solve_sec", "status"]
+    with open(path, "w", newline="", encoding="utf-8") as out_file:
+        writer = csv.writer(out_file)
+        writer.writerow(header)
+        for record in records:
+            for bound in record["bounds"]:
+                row = {**record, **bound}
+                writer.writerow([row[key] for key in header])
+
+
+def load_results(path):
+    """
+    Load the results of a JSON run, keyed by case.
+
+    Args:
+        path (str): The path of the JSON file.
+
+    Returns:
+        dict: The records, keyed by the tuple of CASE_KEYS.
+    """
+    with open(path, encoding="utf-8") as in_file:
+        records = json.load(in_file)["results"]
+    return {tuple(record[key] for key in CASE_KEYS): record for record in records}
+
+
+def compare(args):
+    """
+    Compare two JSON runs case by case and report the changes of the phase timings.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments of the compare command.
+
+    Returns:
+        int: The exit code, 1 if a phase regressed by more than the threshold or a result changed, 0 otherwise.
+    """
+    old = load_results(args.old)
+    new = load_results(args.new)
+    failed = False
+    print(f"{'case':<75} {'phase':<14} {'old':>10} {'new':>10} {'change':>8}")
+    for case in sorted(old.keys() & new.keys(), key=str):
+        name = " ".join(f"{key}={value}" for key, value in zip(CASE_KEYS, case))
+        if (old[case]["status"], old[case]["k"]) != (new[case]["status"], new[case]["k"]):
+            print(f"{name:<75} result changed: {old[case]['status']} k={old[case]['k']} -> "
+                  f"{new[case]['status']} k={new[case]['k']}")
+            failed = True
+        for phase in ("generate_sec", "formulise_sec", "solve_sec"):
+            before, after = old[case][phase], new[case][phase]
+            change = (after - before) / before if before > 0 else 0.0
+            flag = ""
+            if change > args.threshold and after - before > args.min_delta:
+                flag = " REGRESSION"
+                failed = True
+            print(f"{name:<75} {phase:<14} {before:>10.4f} {after:>10.4f} {change:>+8.1%}{flag}")
+
+    for case in sorted(old.keys() ^ new.keys(), key=str):
+        print(f"only in {'old' if case in old else 'new'}: {' '.join(map(str, case))}")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    """
+    Main entry point of the benchmark runner.
+
+    Args:
+        argv (list): The command line arguments, or None for sys.argv.
+
+    Returns:
+        int: The exit code.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the path planning pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run a parameter grid")
+    run_parser.add_argument("--n", type=int, nargs="+", default=[10], help="grid sizes")
+    run_parser.add_argument("--agents", type=int, nargs="+", default=[1], help="numbers of counter agents")
+    run_parser.add_argument("--stay", type=float, nargs="+", default=[0.0], help="stay chances")
+    run_parser.add_argument("--stray", type=int, nargs="+", default=[3], help="stray radii")
+    run_parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="system generator seeds")
+    run_parser.add_argument("--engine", choices=ENGINES, nargs="+", default=["scratch"], help="solving engines")
+    run_parser.add_argument("--max-k", type=int, default=None, help="last path length to check (default n * n)")
+    run_parser.add_argument("--timeout", type=float, default=None, help="timeout of every check in seconds")
+    run_parser.add_argument("--out", required=True, help="output file (.json or .csv)")
+    run_parser.add_argument("--trace", default=None, help="append the witness paths to this file as JSON lines")
+    run_parser.add_argument("--profile", default=None,
+                            help="write the phase timings and solver statistics (.prom for Prometheus, else text)")
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON runs")
+    compare_parser.add_argument("old", help="baseline run")
+    compare_parser.add_argument("new", help="run to compare against the baseline")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="relative slowdown reported as a regression (default 0.1)")
+    compare_parser.add_argument("--min-delta", type=float, default=0.01,
+                                help="ignore slowdowns smaller than this many seconds (default 0.01)")
+
+    parser.add_argument("--log-level", default="WARNING", help="log level of the solvers on stderr (default WARNING)")
+
+    args = parser.parse_args(argv)
+    configure(args.log_level, getattr(args, "trace", None))
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Builder of corpora of generated systems, for regression runs and benchmarks.
+
+Usage (from the repository root):
+    python -m Analyzer.Corpus corpus/ --n 20 --agents 2 --stay 0.3 --stray 5 --count 10000 --seed 0
+    python -m Analyzer.Batch corpus/ --engine graph > results.jsonl
+
+Systems are generated in chunks on a process pool, every chunk drawing from its own stream spawned from the seed, so
+a corpus only depends on its parameters and seed, not on the number of workers. Systems with the same robots are
+kept once, each instance is saved as <hash>.sys (with its Kripke structure unless --no-kripke) and listed in order
+in manifest.json.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from Services.FileManager import close_system, load_system, system_to_file, system_hash, TEMP_PREFIX
+from Services.KripkeGenerator import auto_generate_systems, generate_from_system
+from Services.Logging import configure
+
+MANIFEST = "manifest.json"
+PART_SUFFIX = ".part"
+
+
+def build_chunk(directory, n, agents, stay_chance, stray_radius, chunk, seed_sequence, size, kripke):
+    """
+    Generate a chunk of systems and write the new ones to temporary files, in a worker process.
+
+    Args:
+        directory (str): The directory of the corpus.
+        n (int): Size of the grid.
+        agents (int): Number of counter agents of every system.
+        stay_chance (float): Probability of staying in the same position.
+        stray_radius (int): Maximum radius for straying from the initial position.
+        chunk (int): Index of the chunk.
+        seed_sequence (numpy.random.SeedSequence): The seed stream of the chunk.
+        size (int): Number of systems in the chunk.
+        kripke (bool): Whether to save the Kripke structure of every system as well.
+
+    Returns:
+        list: An entry per system of the chunk: its hash, chunk, index in the chunk, the temporary file it was
+            written to (None if the corpus or the chunk already holds it) and the number of states of its Kripke
+            structure (read back from the file if the corpus already holds it).
+    """
+    entries = []
+    seen = set()
+    systems = auto_generate_systems(n, size, agents, stay_chance, stray_radius, seed_sequence, kripke=False)
+    for index, (system, _) in enumerate(systems):
+        digest = system_hash(system, n)
+        entry = {"hash": digest, "chunk": chunk, "index": index, "part": None, "kripke_states": None}
+        path = os.path.join(directory, f"{digest}.sys")
+        if digest not in seen and os.path.exists(path):
+            # Saved by an earlier run, its header tells the number of states
+            _, _, M2 = load_system(path)
+            entry["kripke_states"] = len(M2.nodes) if M2 is not None else None
+            close_system(M2)
+        elif digest not in seen:
+            M2 = generate_from_system(system, n) if kripke else None
+            entry["part"] = os.path.join(directory, f"{digest}.sys{PART_SUFFIX}.{chunk}")
+            entry["kripke_states"] = len(M2.nodes) if M2 is not None else None
+            system_to_file(entry["part"], system, n, M2)
+        seen.add(digest)
+        entries.append(entry)
+    return entries
+
+
+def build_chunk_args(args):
+    """
+    Unpack the arguments of build_chunk, for the pool.
+
+    Args:
+        args (tuple): The arguments of build_chunk.
+
+    Returns:
+        list: The entries of the chunk.
+    """
+    return build_chunk(*args)
+
+
+def build_corpus(directory, n, agents, stay_chance, stray_radius, count, seed=0, chunk_size=64, workers=None,
+                 kripke=True, max_chunks=None, log_level="WARNING"):
+    """
+    Build a corpus of distinct generated systems.
+
+    Chunks are taken in order, a system being kept if no earlier system of the corpus has the same robots, until
+    count systems are kept or max_chunks chunks are used.
+
+    Args:
+        directory (str): The directory of the corpus, created if needed.
+        n (int): Size of the grid.
+        agents (int): Number of counter agents of every system.
+        stay_chance (float): Probability of staying in the same position.
+        stray_radius (int): Maximum radius for straying from the initial position.
+        count (int): Number of distinct systems to keep.
+        seed (int): The seed the chunk streams are spawned from.
+        chunk_size (int): Number of systems generated per chunk.
+        workers (int): Worker processes, or None for the number of CPUs.
+        kripke (bool): Whether to save the Kripke structure of every system as well.
+        max_chunks (int): The most chunks to generate, or None for 4 times as many as count needs without duplicates.
+        log_level (str): The log level of the workers.
+
+    Returns:
+        dict: The manifest of the corpus.
+    """
+    start = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    needed = -(-count // chunk_size)
+    max_chunks = max_chunks if max_chunks is not None else 4 * needed
+    streams = np.random.SeedSequence(seed).spawn(max_chunks)
+    workers = min(workers or os.cpu_count() or 1, max_chunks) or 1
+
+    instances = []
+    hashes = set()
+    duplicates = 0
+    chunks = 0
+    # Spawned workers do not inherit the Z3 context of the parent
+    with multiprocessing.get_context("spawn").Pool(workers, configure, (log_level,)) as pool:
+        pending = []
+        while len(instances) < count and (pending or chunks < max_chunks):
+            # Keep a bounded window of chunks in flight, consumed in order for a deterministic corpus
+            while chunks < max_chunks and len(pending) < 2 * workers:
+                args = (directory, n, agents, stay_chance, stray_radius, chunks, streams[chunks], chunk_size, kripke)
+                pending.append(pool.apply_async(build_chunk_args, (args,)))
+                chunks += 1
+            for entry in pending.pop(0).get():
+                path = os.path.join(directory, f"{entry['hash']}.sys")
+                if entry["hash"] in hashes or len(instances) >= count:
+                    if entry["hash"] in hashes:
+                        duplicates += 1
+                    if entry["part"] is not None:
+                        os.remove(entry["part"])
+                    continue
+                if entry["part"] is not None:
+                    os.replace(entry["part"], path)
+                hashes.add(entry["hash"])
+                instances.append({"id": len(instances), "file": os.path.basename(path), "hash": entry["hash"],
+                                  "chunk": entry["chunk"], "index": entry["index"],
+                                  "kripke_states": entry["kripke_states"]})
+
+    # Chunks still in flight when the corpus was complete, and the files they were writing
+    for part in glob.glob(os.path.join(directory, f"*.sys{PART_SUFFIX}.*")):
+        os.remove(part)
+    for temp in glob.glob(os.path.join(directory, f"{TEMP_PREFIX}*.tmp")):
+        os.remove(temp)
+
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "parameters": {"n": n, "agents": agents, "stay_chance": stay_chance, "stray_radius": stray_radius,
+                       "seed": seed, "chunk_size": chunk_size, "kripke": kripke},
+        "generated_chunks": chunks,
+        "duplicates": duplicates,
+        "elapsed_sec": time.perf_counter() - start,
+        "instances": instances,
+    }
+    temp_path = os.path.join(directory, MANIFEST + PART_SUFFIX)
+    with open(temp_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    os.replace(temp_path, os.path.join(directory, MANIFEST))
+    return manifest
+
+
+def main(argv=None):
+    """
+    Main entry point of the corpus builder.
+
+    Args:
+        argv (list): The command line arguments, or None for sys.argv.
+
+    Returns:
+        int: The exit code, 1 if fewer distinct systems than requested could be generated, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Build a corpus of distinct generated systems with a manifest.")
+    parser.add_argument("directory", help="directory of the corpus")
+    parser.add_argument("--n", type=int, required=True, help="size of the grid")
+    parser.add_argument("--agents", type=int, default=1, help="counter agents per system (default 1)")
+    parser.add_argument("--stay", type=float, default=0.3, help="stay chance (default 0.3)")
+    parser.add_argument("--stray", type=int, default=5, help="stray radius (default 5)")
+    parser.add_argument("--count", type=int, required=True, help="number of distinct systems")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the corpus (default 0)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="systems generated per task (default 64)")
+    parser.add_argument("--max-chunks", type=int, default=None,
+                        help="most chunks to generate (default 4 times as many as needed without duplicates)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default the number of CPUs)")
+    parser.add_argument("--no-kripke", action="store_true", help="save the robots only")
+    parser.add_argument("--log-level", default="WARNING", help="log level of the workers on stderr (default WARNING)")
+    args = parser.parse_args(argv)
+
+    manifest = build_corpus(args.directory, args.n, args.agents, args.stay, args.stray, args.count, args.seed,
+                            args.chunk_size, args.workers, not args.no_kripke, args.max_chunks, args.log_level)
+    kept = len(manifest["instances"])
+    print(f"{kept} systems ({manifest['duplicates']} duplicates skipped) in {manifest['elapsed_sec']:.1f}s",
+          file=sys.stderr)
+    return 0 if kept == args.count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
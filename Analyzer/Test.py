@@ -5,9 +5,9 @@ from z3 import sat
 import csv
 
 # Importing custom modules
-from Services.FileManager import system_to_file
+from Services.FileManager import system_to_file, system_hash
 from Services.KripkeGenerator import auto_generate_system
-from Services.Solver import Solve
+from Services.Solver import solve_incremental
 
 # Define header for the CSV file
 header = ['Number', 'Iterations', 'Gen Time', 'Solution Time', 'Avg Iter Time']
@@ -42,6 +42,7 @@ writer.writerow(header)
 
 # Loop through the test iterations
 t = 0
+seen = set()
 while t < num_tests_to_perform:
     k = (2 * n) - 1
     start_gen = time.time()
@@ -49,13 +50,15 @@ while t < num_tests_to_perform:
     sys, m2 = auto_generate_system(n, counter_agents, stay_chance, stray_radius)
     end_gen = time.time()
 
-    stat = None
+    # Skip systems identical to an earlier test
+    digest = system_hash(sys, n)
+    if digest in seen:
+        continue
+    seen.add(digest)
+
     start_solve = time.time()
     # Solve the system with incremental k values until satisfiable or max_iter reached (BMC)
-    while stat != sat and k <= max_iter:
-        stat, sol = Solve(n, m2, k)
-        if stat != sat:
-            k += 1
+    stat, sol, k = solve_incremental(n, m2, k, max_iter)
     end_solve = time.time()
 
     # If satisfiable, record the results
@@ -70,7 +73,7 @@ while t < num_tests_to_perform:
         writer.writerow(data)
 
         # Save the system to a file
-        system_to_file(f'{path}/{t}.sys', m2)
+        system_to_file(f'{path}/{t}.sys', sys, n)
 
         # Print results
         print(f'Generation time: {gen_time}')
@@ -3,7 +3,7 @@ from PyQt5.QtWidgets import QPushButton, QVBoxLayout, QWidget, QFileDialog
 
 from DesignerView import DesignerView
 from GeneratorView import GeneratorView
-from Services.FileManager import system_from_file
+from Services.FileManager import load_system
 from SystemView import SystemView
 
 
@@ -85,8 +85,8 @@ class ChoiceView(QWidget):
         if file_path:
             # If a file is selected, load the system and display it
             print(f"Selected file: {file_path}")
-            M2 = system_from_file(file_path)
-            sysView = SystemView(M2, self)
+            system, n, M2 = load_system(file_path)
+            sysView = SystemView(M2, self, system, n)
             self.window.setCentralWidget(sysView)
 
     def generateSystem(self):
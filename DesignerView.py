@@ -8,7 +8,6 @@ from PyQt5.QtWidgets import (
 
 from Models.Robot import Robot
 from Models.System import System
-from Services import KripkeGenerator
 from SystemView import SystemView
 from Utils.Visual import ArrowWidget
 
@@ -292,11 +291,9 @@ class DesignerView(QWidget):
         """
         Finish designing the system and display it in the main window.
 
-        Generate the Kripke structure from the designed system and set it as the central widget
-        of the parent window.
+        Show the designed system in the main window, its Kripke structure is generated when first needed.
         """
-        M2 = KripkeGenerator.generate_from_system(self.designed_system, self.grid_size)
-        sysView = SystemView(M2, self.parent)
+        sysView = SystemView(None, self.parent, self.designed_system, self.grid_size)
         self.parent.window.setCentralWidget(sysView)
 
     def set_robot(self):
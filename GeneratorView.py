@@ -109,8 +109,8 @@ class GeneratorView(QWidget):
             QMessageBox.warning(self, "Invalid Input", "Please enter valid numeric values.")
             return
 
-        M2 = auto_generate_system(grid_size, num_counteragents, stay_chance, stray_radius)
+        system, M2 = auto_generate_system(grid_size, num_counteragents, stay_chance, stray_radius)
         QMessageBox.information(self, "System Generated", "System has been generated successfully.")
 
-        systemViewer = SystemView(M2[1], self.parent)
+        systemViewer = SystemView(M2, self.parent, system)
         self.parent.window.setCentralWidget(systemViewer)
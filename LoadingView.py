@@ -1,17 +1,24 @@
+import time
+
 from PyQt5 import Qt
 from PyQt5 import Qt
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QProgressBar, QHBoxLayout
 from z3 import sat, unsat
 
 from ResultView import ResultView
-from Services.Solver import run_solver_on_thread, get_result
+from Services.GraphSearch import shortest_path
+from Services.ResultCache import default_cache
+from Services.Solver import run_solver_on_thread, IncrementalSolver, FORMULA_BUILT, CHECK_FINISHED, JOB_FINISHED
 
 
 class LoadingWindow(QWidget):
     """
     Widget for displaying a loading window while solving a system.
     """
+    # Progress events of the solver, emitted on the solver thread and delivered on the GUI thread
+    progress = pyqtSignal(object)
+
     def __init__(self, n, M2, timeout_sec, max_k, parent):
         """
         Initialize the LoadingWindow widget.
@@ -32,10 +39,23 @@ class LoadingWindow(QWidget):
         self.M2 = M2
         self.timeout_sec = timeout_sec
         self.max_k = max_k
-        self.k = (2 * n) - 1
+        # The graph search gives the minimal bound at once, the SAT solver only cross-checks it; it shares the
+        # timeout with the solver, which starts from the lowest bound if the search runs out of time
+        deadline = time.monotonic() + timeout_sec
+        status, _, k = shortest_path(n, M2, max_k, deadline=deadline)
+        if status == "timeout":
+            self.first_k = (2 * n) - 1
+        else:
+            self.first_k = k if status == sat else max_k
+        self.k = self.first_k
         self.sec_counter = 0
         self.is_running = True
-        self.current_thread = run_solver_on_thread(self.n, self.M2, self.k)
+        self.progress_text = ""
+        self.progress.connect(self.on_progress, Qt.QueuedConnection)
+        self.bmc = IncrementalSolver(self.n, self.M2, on_event=self.progress.emit)
+        self.cache = default_cache()
+        self.current_job = run_solver_on_thread(self.n, self.M2, self.k, self.bmc,
+                                                max(deadline - time.monotonic(), 0), self.cache, self.progress.emit)
         self.parent = parent
         self.parent.window.setGeometry(100, 100, 400, 120)
         self.init_ui()
@@ -56,7 +76,7 @@ class LoadingWindow(QWidget):
         # Label to show updates
         self.label = QLabel("", self)
         self.label.setStyleSheet("font-size: 16px; font-weight: bold;")
-        self.label.setText(f" elapsed (seconds): {self.sec_counter}, iteration {self.k}/{self.max_k}")
+        self.refresh_label()
         centered_layout = QHBoxLayout()
         centered_layout.addStretch(1)
         centered_layout.addWidget(self.label)
@@ -84,15 +104,47 @@ class LoadingWindow(QWidget):
             self.sec_counter += 1
             if self.timeout_sec <= self.sec_counter:
                 print("Timeout in GUI")
+                self.current_job.cancel()
                 self.reset()
                 RView = ResultView(self.parent, self.n, ('timeout', []), self.M2)
                 self.parent.window.setCentralWidget(RView)
 
-        if not self.current_thread.is_alive() and self.is_running:
-            res = get_result()
+        self.check_job()
+
+    def on_progress(self, event):
+        """
+        Show a progress event of the solver, and handle the result of the job as soon as it finishes.
+
+        Args:
+            event (dict): The event (see Services.Solver.emit).
+        """
+        if not self.is_running:
+            return
+        if event["event"] == FORMULA_BUILT:
+            self.progress_text = f", {event['clauses']} clauses"
+        elif event["event"] == CHECK_FINISHED:
+            self.progress_text = f", last check {event['duration_sec']:.2f}s"
+        elif event["event"] == JOB_FINISHED and event["k"] == self.k:
+            self.check_job()
+        if self.is_running:
+            self.refresh_label()
+
+    def refresh_label(self):
+        """
+        Show the elapsed time, the current bound and the last progress of the solver.
+        """
+        self.label.setText(f" elapsed (seconds): {self.sec_counter}, iteration {self.k}/{self.max_k}"
+                           f"{self.progress_text}")
+
+    def check_job(self):
+        """
+        Handle the result of the current job if it has finished: show the result or start the next bound.
+        """
+        if self.current_job.status != "running" and self.is_running:
+            res = self.current_job.result
             if res[0] == sat:
                 total_time = self.sec_counter
-                time_per_iter = total_time / (self.k - (2 * self.n) + 2)
+                time_per_iter = total_time / (self.k - self.first_k + 1)
                 self.reset()
                 print("Solved in GUI")
                 RView = ResultView(self.parent, self.n, res, self.M2, total_time=total_time, time_per_iter=time_per_iter)
@@ -101,18 +153,26 @@ class LoadingWindow(QWidget):
             elif res[0] == unsat:
                 if self.k < self.max_k:
                     self.k += 1
-                    self.current_thread = run_solver_on_thread(self.n, self.M2, self.k)
+                    self.current_job = run_solver_on_thread(self.n, self.M2, self.k, self.bmc,
+                                                            self.timeout_sec - self.sec_counter, self.cache,
+                                                            self.progress.emit)
                 else:
                     print("Not Solved in GUI")
                     total_time = self.sec_counter
-                    time_per_iter = total_time / (self.k - (2 * self.n) + 2)
+                    time_per_iter = total_time / (self.k - self.first_k + 1)
                     self.reset()
                     RView = ResultView(self.parent, self.n, res, self.M2, total_time=total_time, time_per_iter=time_per_iter)
                     self.parent.window.setCentralWidget(RView)
 
+            elif res[0] == 'timeout':
+                print("Timeout in GUI")
+                self.reset()
+                RView = ResultView(self.parent, self.n, ('timeout', []), self.M2)
+                self.parent.window.setCentralWidget(RView)
+
         # Reset the progress bar for the loading animation
         if self.is_running:
-            self.label.setText(f" elapsed (seconds): {self.sec_counter}, iteration {self.k}/{self.max_k}")
+            self.refresh_label()
             self.progress_bar.setRange(0, 0)
 
     def reset(self):
@@ -1,3 +1,8 @@
+import numpy as np
+
+from Models.Lasso import Lasso
+
+
 class Kripke:
     def __init__(self, n):
         """
@@ -10,7 +15,11 @@ class Kripke:
         self.relations = {}
         self.count = 0
         self.n = n
-        pass
+        self.initial_id = None
+        self.final_id = None
+        self._lasso = None
+        self._successors = None
+        self._fingerprints = {}
 
     def __getstate__(self):
         """
@@ -19,16 +28,28 @@ class Kripke:
         Returns:
             dict: The state of the Kripke structure.
         """
-        return self.__dict__
+        state = dict(self.__dict__)
+        state.pop('_lasso', None)
+        state.pop('_successors', None)
+        state.pop('_fingerprints', None)
+        return state
 
     def __setstate__(self, state):
         """
         Set the state of the Kripke structure after unpickling.
 
+        Structures pickled before the initial and final IDs were kept look them up once.
+
         Args:
             state (dict): The state of the Kripke structure.
         """
         self.__dict__.update(state)
+        if 'initial_id' not in state:
+            self.initial_id = next((node.node_id for node in self.nodes if node.initial), None)
+            self.final_id = next((node.node_id for node in self.nodes if node.final), None)
+        self._lasso = None
+        self._successors = None
+        self._fingerprints = {}
 
     def add_node(self, node):
         """
@@ -39,6 +60,11 @@ class Kripke:
         """
         self.nodes.append(node)
         self.count += 1
+        if node.initial and self.initial_id is None:
+            self.initial_id = node.node_id
+        if node.final and self.final_id is None:
+            self.final_id = node.node_id
+        self.changed()
 
     def add_relation(self, node1, node2):
         """
@@ -51,6 +77,7 @@ class Kripke:
         if not (node1.node_id in self.relations):
             self.relations[node1.node_id] = set()
         self.relations[node1.node_id].add(node2.node_id)
+        self.changed()
 
     def add_relation_by_id(self, node1_id, node2_id):
         """
@@ -63,6 +90,60 @@ class Kripke:
         if not (node1_id in self.relations):
             self.relations[node1_id] = set()
         self.relations[node1_id].add(node2_id)
+        self.changed()
+
+    def changed(self):
+        """
+        Drop the cached successor arrays, run and fingerprints after the structure changes.
+        """
+        self._lasso = None
+        self._successors = None
+        self._fingerprints = {}
+
+    def successor_arrays(self):
+        """
+        Get the relations in compressed sparse row form, the successors of node i being
+        targets[offsets[i]:offsets[i + 1]] in ascending order.
+
+        Returns:
+            tuple: The offsets (one more than the number of node IDs) and the targets, as numpy arrays, built once
+                and cached until the structure changes.
+        """
+        if self._successors is None:
+            sources = sorted(self.relations)
+            degrees = np.zeros(max(self.count, sources[-1] + 1 if sources else 0) + 1, dtype=np.int64)
+            degrees[np.array(sources, dtype=np.int64) + 1] = [len(self.relations[source]) for source in sources]
+            targets = np.array([target for source in sources for target in sorted(self.relations[source])],
+                               dtype=np.int64)
+            self._successors = np.cumsum(degrees), targets
+        return self._successors
+
+    def successors(self, node_id):
+        """
+        Get the successors of a node.
+
+        Args:
+            node_id (int): The ID of the node.
+
+        Returns:
+            numpy.ndarray: The IDs of the successors in ascending order, a view of the successor arrays.
+        """
+        offsets, targets = self.successor_arrays()
+        return targets[offsets[node_id]:offsets[node_id + 1]]
+
+    def successor(self, node_id):
+        """
+        Get the first successor of a node.
+
+        Args:
+            node_id (int): The ID of the node.
+
+        Returns:
+            int: The lowest ID among the successors, or None if the node has none.
+        """
+        offsets, targets = self.successor_arrays()
+        start = offsets[node_id]
+        return int(targets[start]) if start < offsets[node_id + 1] else None
 
     def are_related(self, node1, node2):
         """
@@ -75,7 +156,7 @@ class Kripke:
         Returns:
             bool: True if there is a relation, False otherwise.
         """
-        return node1 in self.nodes and node1 in self.relations and node2.node_id in self.relations[node1.node_id]
+        return node2.node_id in self.relations.get(node1.node_id, ())
 
     def get_initial_state(self):
         """
@@ -84,10 +165,7 @@ class Kripke:
         Returns:
             Node: The initial state node, or None if not found.
         """
-        for n in self.nodes:
-            if n.initial:
-                return n
-        return None
+        return self.nodes[self.initial_id] if self.initial_id is not None else None
 
     def get_final_state(self):
         """
@@ -96,7 +174,71 @@ class Kripke:
         Returns:
             Node: The final state node, or None if not found.
         """
-        for n in self.nodes:
-            if n.final:
-                return n
-        return None
+        return self.nodes[self.final_id] if self.final_id is not None else None
+
+    def lasso(self):
+        """
+        Get the run of the Kripke structure from the initial state, following the first successor of every state.
+
+        Returns:
+            Lasso: The node ids of the run, computed once and cached until the structure changes.
+
+        Raises:
+            ValueError: If the structure has no initial state, or the run reaches a state without successors or
+                whose ID is not one of its nodes.
+        """
+        if self._lasso is None:
+            if self.initial_id is None:
+                raise ValueError("The Kripke structure has no initial state")
+            offsets, targets = (array.tolist() for array in self.successor_arrays())
+            order = []
+            index = [-1] * (len(offsets) - 1)
+            node_id = self.initial_id
+            while True:
+                if not 0 <= node_id < self.count:
+                    raise ValueError(f"The Kripke structure has no state {node_id}")
+                if index[node_id] >= 0:
+                    break
+                index[node_id] = len(order)
+                order.append(node_id)
+                if offsets[node_id] == offsets[node_id + 1]:
+                    raise ValueError(f"The Kripke structure has no successor for state {node_id}")
+                node_id = targets[offsets[node_id]]
+            self._lasso = Lasso(order, index[node_id])
+        return self._lasso
+
+    def state_at(self, t):
+        """
+        Get the state of the run at a time step.
+
+        Args:
+            t (int): The time step.
+
+        Returns:
+            Node: The node the run is in at time step t.
+        """
+        return self.nodes[self.lasso().state_at(t)]
+
+    def occupancy_at(self, t):
+        """
+        Get the occupancy of the grid at a time step.
+
+        Args:
+            t (int): The time step.
+
+        Returns:
+            int: The occupancy bitmask of the run's state at time step t (see Node.occupancy).
+        """
+        return self.state_at(t).occupancy
+
+    def phase_at(self, t):
+        """
+        Get the phase of the run at a time step, equal phases having equal futures.
+
+        Args:
+            t (int): The time step.
+
+        Returns:
+            int: Index in the run of the state at time step t.
+        """
+        return self.lasso().index_at(t)
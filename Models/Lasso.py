@@ -0,0 +1,46 @@
+class Lasso:
+    def __init__(self, states, loop_start):
+        """
+        Initialize a lasso: a prefix of states followed by a cycle that repeats forever.
+
+        Args:
+            states (list): The states of the prefix followed by the states of one cycle.
+            loop_start (int): Index in states of the first state of the cycle.
+        """
+        self.states = states
+        self.loop_start = loop_start
+
+    def period(self):
+        """
+        Get the length of the cycle.
+
+        Returns:
+            int: The number of states in the cycle.
+        """
+        return len(self.states) - self.loop_start
+
+    def index_at(self, t):
+        """
+        Get the index of the state at a time step.
+
+        Args:
+            t (int): The time step.
+
+        Returns:
+            int: Index in states of the state at time step t.
+        """
+        if t < len(self.states):
+            return t
+        return self.loop_start + (t - self.loop_start) % self.period()
+
+    def state_at(self, t):
+        """
+        Get the state at a time step.
+
+        Args:
+            t (int): The time step.
+
+        Returns:
+            The state at time step t.
+        """
+        return self.states[self.index_at(t)]
@@ -1,4 +1,6 @@
 class Node:
+    __slots__ = ('node_id', 'initial', 'final', 'n', 'occupancy')
+
     def __init__(self, node_id, is_initial, is_final, n):
         """
         Initialize a Node object with the specified properties.
@@ -9,14 +11,12 @@ class Node:
             is_final (bool): Whether the node is a final state.
             n (int): The size of the grid (n x n).
         """
-        self.properties = []
-        for rows in range(n):
-            self.properties.append([])
-            for columns in range(n):
-                self.properties[rows].append(False)
         self.node_id = node_id
         self.initial = is_initial
         self.final = is_final
+        self.n = n
+        # Occupancy of the grid packed into an int, bit (row * n + column) is set if the cell is occupied
+        self.occupancy = 0
 
     def __getstate__(self):
         """
@@ -25,16 +25,29 @@ class Node:
         Returns:
             dict: The state of the node.
         """
-        return self.__dict__
+        return {slot: getattr(self, slot) for slot in self.__slots__}
 
     def __setstate__(self, state):
         """
         Set the state of the node after unpickling.
 
+        Nodes pickled before the occupancy was packed hold an n x n list of booleans as 'properties',
+        which is converted.
+
         Args:
             state (dict): The state of the node.
         """
-        self.__dict__.update(state)
+        if 'properties' in state:
+            state = dict(state)
+            properties = state.pop('properties')
+            state['n'] = len(properties)
+            state['occupancy'] = 0
+            for row, values in enumerate(properties):
+                for column, value in enumerate(values):
+                    if value:
+                        state['occupancy'] |= 1 << (row * len(properties) + column)
+        for slot, value in state.items():
+            setattr(self, slot, value)
 
     def add_property(self, present, row, column):
         """
@@ -46,7 +59,46 @@ class Node:
             column (int): Column index of the property.
         """
         if present:
-            self.properties[row][column] = True
+            self.occupancy |= 1 << (row * self.n + column)
+
+    def is_occupied(self, row, column):
+        """
+        Check whether a cell is occupied.
+
+        Args:
+            row (int): Row index of the cell.
+            column (int): Column index of the cell.
+
+        Returns:
+            bool: True if the cell is occupied, False otherwise.
+        """
+        return (self.occupancy >> (row * self.n + column)) & 1 == 1
+
+    def occupied_cells(self):
+        """
+        Get the occupied cells, visiting only the set bits.
+
+        Returns:
+            list: The (row, column) of every occupied cell, in row major order.
+        """
+        cells = []
+        mask = self.occupancy
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            cells.append(divmod(index, self.n))
+            mask ^= low
+        return cells
+
+    @property
+    def properties(self):
+        """
+        Get the occupancy as an n x n list of booleans.
+
+        Returns:
+            list: A 2D list, True where the cell is occupied.
+        """
+        return [[self.is_occupied(row, column) for column in range(self.n)] for row in range(self.n)]
 
     def __eq__(self, other):
         """
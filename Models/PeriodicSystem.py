@@ -0,0 +1,68 @@
+from Models.Node import Node
+
+
+class PeriodicSystem:
+    def __init__(self, n, lassos):
+        """
+        Initialize a system of independently periodic counter agents.
+
+        Instead of the product Kripke structure of all the robots, every robot keeps its own lasso of
+        occupancy bitmasks, and the occupancy at a time step is the union of the robots' states at that step.
+        Memory grows with the sum of the periods rather than their least common multiple.
+
+        Args:
+            n (int): The size of the grid (n x n).
+            lassos (list): The Lasso of every robot, its states being occupancy bitmasks (see Node.occupancy).
+        """
+        self.n = n
+        self.lassos = lassos
+
+    def occupancy_at(self, t):
+        """
+        Get the occupancy of the grid at a time step.
+
+        Args:
+            t (int): The time step.
+
+        Returns:
+            int: The occupancy bitmask of all the robots at time step t.
+        """
+        occupancy = 0
+        for lasso in self.lassos:
+            occupancy |= lasso.state_at(t)
+        return occupancy
+
+    def phase_at(self, t):
+        """
+        Get the phase of the system at a time step, equal phases having equal futures.
+
+        Args:
+            t (int): The time step.
+
+        Returns:
+            tuple: The index of every robot in its lasso at time step t.
+        """
+        return tuple(lasso.index_at(t) for lasso in self.lassos)
+
+    def state_at(self, t):
+        """
+        Get the state of the system at a time step.
+
+        Args:
+            t (int): The time step.
+
+        Returns:
+            Node: A node holding the occupancy at time step t.
+        """
+        node = Node(t, t == 0, False, self.n)
+        node.occupancy = self.occupancy_at(t)
+        return node
+
+    def get_initial_state(self):
+        """
+        Get the initial state of the system.
+
+        Returns:
+            Node: A node holding the initial occupancy.
+        """
+        return self.state_at(0)
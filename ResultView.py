@@ -1,11 +1,15 @@
 from PyQt5 import Qt
 from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QHBoxLayout, \
-    QScrollArea
+    QScrollArea, QSlider, QComboBox
 from z3 import sat, unsat
 
+from Services.Playback import PlaybackFrames
 from Utils.Visual import GridDrawerWidget
 
+# Playback speeds, as multiples of one time step per second
+SPEEDS = (0.25, 0.5, 1, 2, 4)
+
 
 class ResultView(QWidget):
     """
@@ -25,13 +29,14 @@ class ResultView(QWidget):
         """
         super().__init__()
         self.time_label = None
-        self.bad_robot = None
         self.parent = parent
         self.grid_widget = None
+        self.slider = None
+        self.frames = None
+        self.shown = None
         self.N = N
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_movement)
-        self.t = 0
         self.status = result[0]
         self.result = result[1]
         self.total_time = total_time
@@ -85,7 +90,23 @@ class ResultView(QWidget):
             sub_layout.setWidget(self.grid_widget)
             sub_layout.setWidgetResizable(True)
             layout.addWidget(sub_layout)
-            self.update_movement()
+
+            # Playback controls: scrubbing and speed
+            controls_layout = QHBoxLayout()
+            self.slider = QSlider(Qt.Qt.Horizontal, self)
+            self.slider.setRange(0, len(self.result) - 1)
+            self.slider.valueChanged.connect(self.show_frame)
+            speed_box = QComboBox(self)
+            speed_box.addItems([f"{speed}x" for speed in SPEEDS])
+            speed_box.setCurrentIndex(SPEEDS.index(1))
+            speed_box.currentIndexChanged.connect(self.set_speed)
+            controls_layout.addWidget(self.slider)
+            controls_layout.addWidget(speed_box)
+            layout.addLayout(controls_layout)
+
+            # Every frame is rendered once, a tick only repaints the cells that changed
+            self.frames = PlaybackFrames(self.M2, self.N, self.result)
+            self.show_frame(0)
             self.timer.start(1000)
 
         elif self.status == unsat:
@@ -117,25 +138,29 @@ class ResultView(QWidget):
 
     def update_movement(self):
         """
-        Update the movement in the system visualization.
+        Advance the playback by one time step, wrapping around at the end of the solution.
         """
-        self.time_label.setText(f'T={self.t + 1}/{len(self.result)} |')
-        if self.t == 0:
-            self.bad_robot = self.M2.get_initial_state().node_id
-        else:
-            self.bad_robot = list(self.M2.relations[self.bad_robot])[0]
-            pass
-        self.grid_widget.mark_rectangle_bad(self.extract_present(self.M2.nodes[self.bad_robot].properties, self.N))
-        row = self.result[self.t][0]
-        column = self.result[self.t][1]
-        self.grid_widget.mark_rectangle_good(row, column)
-        self.grid_widget.update()
-        self.t = (self.t + 1) % len(self.result)
-
-    def extract_present(self, grid, n):
-        points = []
-        for row in range(n):
-            for col in range(n):
-                if grid[row][col] is True:
-                    points.append((row, col))
-        return points
+        self.slider.setValue((self.slider.value() + 1) % len(self.frames))
+
+    def show_frame(self, t):
+        """
+        Show the frame of a time step, on every tick and when scrubbing.
+
+        Args:
+            t (int): The time step.
+        """
+        if self.frames is None or t == self.shown:
+            return
+        self.time_label.setText(f'T={t + 1}/{len(self.result)} |')
+        changed = None if self.shown is None else self.frames.changed_cells(self.shown, t)
+        self.grid_widget.set_frame(self.frames.frame(t), changed)
+        self.shown = t
+
+    def set_speed(self, index):
+        """
+        Change the playback speed.
+
+        Args:
+            index (int): Index of the speed in SPEEDS.
+        """
+        self.timer.setInterval(int(1000 / SPEEDS[index]))
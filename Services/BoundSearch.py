@@ -0,0 +1,170 @@
+import time
+
+from z3 import sat, unsat
+
+from Services.Solver import IncrementalSolver, Solve
+
+LINEAR = "linear"
+GALLOPING = "galloping"
+SCHEDULE = "schedule"
+
+
+def make_oracle(n, M2, incremental=True, timeout_sec=None, deadline=None):
+    """
+    Create an oracle checking whether the agent can reach the goal within a bound.
+
+    The oracle uses the "within" encoding, in which the path ends on its first arrival at the goal, so the
+    answers are monotone: if the goal can be reached within k steps it can be reached within any larger bound.
+    This is what allows the bounds to be checked out of order without losing the minimal path.
+
+    Args:
+        n (int): Size of the grid.
+        M2 (Kripke): The Kripke structure.
+        incremental (bool): Share a single IncrementalSolver between the checks instead of solving every bound
+            from scratch.
+        timeout_sec (float): Timeout of every check in seconds, or None for no timeout.
+        deadline (float): time.monotonic() time the whole search must end by, or None for no deadline.
+
+    Returns:
+        callable: A function taking a bound and returning the status (sat, unsat or "timeout") and the solution.
+    """
+    bmc = IncrementalSolver(n, M2, within=True) if incremental else None
+
+    def oracle(k):
+        limit = timeout_sec
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return "timeout", []
+            limit = remaining if limit is None else min(limit, remaining)
+        if bmc is not None:
+            return bmc.solve(k, timeout_sec=limit)
+        return Solve(n, M2, k, timeout_sec=limit, within=True)
+
+    return oracle
+
+
+def bisect(oracle, low, high, found):
+    """
+    Find the first satisfiable bound between a bound known to be unsatisfiable and a satisfiable one.
+
+    Args:
+        oracle (callable): The oracle, as returned by make_oracle.
+        low (int): The largest bound known to be unsatisfiable, or one below the first bound.
+        high (int): A satisfiable bound.
+        found (tuple): The status and solution of the high bound.
+
+    Returns:
+        tuple: A tuple containing the status, the solution and the path length it was found at.
+    """
+    while high - low > 1:
+        mid = (low + high) // 2
+        status, solution = oracle(mid)
+        if status == sat:
+            high, found = mid, (status, solution)
+        elif status == unsat:
+            low = mid
+        else:
+            return status, solution, mid
+    return found[0], found[1], high
+
+
+def linear_search(oracle, min_k, max_k):
+    """
+    Check the bounds one at a time in increasing order.
+
+    Args:
+        oracle (callable): The oracle, as returned by make_oracle.
+        min_k (int): The first path length to check.
+        max_k (int): The last path length to check.
+
+    Returns:
+        tuple: A tuple containing the status, the solution and the path length it was found at.
+    """
+    status, solution, k = unsat, [], min_k
+    for k in range(min_k, max_k + 1):
+        status, solution = oracle(k)
+        if status != unsat:
+            break
+    return status, solution, k
+
+
+def galloping_search(oracle, min_k, max_k):
+    """
+    Check the bounds min_k, min_k + 1, min_k + 3, min_k + 7... until one is satisfiable, then bisect between
+    the last unsatisfiable bound and it.
+
+    Args:
+        oracle (callable): The oracle, as returned by make_oracle.
+        min_k (int): The first path length to check.
+        max_k (int): The last path length to check.
+
+    Returns:
+        tuple: A tuple containing the status, the solution and the path length it was found at.
+    """
+    schedule = []
+    step = 1
+    while min_k + step - 1 < max_k:
+        schedule.append(min_k + step - 1)
+        step *= 2
+    return scheduled_search(oracle, schedule + [max_k], min_k, max_k)
+
+
+def scheduled_search(oracle, schedule, min_k, max_k):
+    """
+    Check the bounds of a schedule in increasing order until one is satisfiable, then bisect between the last
+    unsatisfiable bound and it.
+
+    Args:
+        oracle (callable): The oracle, as returned by make_oracle.
+        schedule (list): The bounds to check, the ones outside [min_k, max_k] are ignored and max_k is always
+            checked last.
+        min_k (int): The first path length to check.
+        max_k (int): The last path length to check.
+
+    Returns:
+        tuple: A tuple containing the status, the solution and the path length it was found at.
+    """
+    low = min_k - 1
+    status, solution, k = unsat, [], max_k
+    for k in sorted({k for k in schedule if min_k <= k < max_k} | {max_k}):
+        status, solution = oracle(k)
+        if status == sat:
+            return bisect(oracle, low, k, (status, solution))
+        if status != unsat:
+            break
+        low = k
+    return status, solution, k
+
+
+def find_shortest_path(n, M2, min_k, max_k, strategy=GALLOPING, schedule=None, incremental=True,
+                       timeout_sec=None, deadline=None):
+    """
+    Search for the shortest path between the given bounds.
+
+    Args:
+        n (int): Size of the grid.
+        M2 (Kripke): The Kripke structure.
+        min_k (int): The first path length to check.
+        max_k (int): The last path length to check.
+        strategy (str): LINEAR, GALLOPING or SCHEDULE.
+        schedule (list): The bounds to check with the SCHEDULE strategy.
+        incremental (bool): Share a single IncrementalSolver between the checks.
+        timeout_sec (float): Timeout of every check in seconds, or None for no timeout.
+        deadline (float): time.monotonic() time the whole search must end by, or None for no deadline.
+
+    Returns:
+        tuple: A tuple containing the status (sat, unsat or "timeout"), the solution and the path length
+            it was found at (or the last one checked).
+    """
+    min_k = max(min_k, (2 * n) - 1)
+    if max_k < min_k:
+        return unsat, [], max_k
+    oracle = make_oracle(n, M2, incremental, timeout_sec, deadline)
+    if strategy == LINEAR:
+        return linear_search(oracle, min_k, max_k)
+    if strategy == GALLOPING:
+        return galloping_search(oracle, min_k, max_k)
+    if strategy == SCHEDULE:
+        return scheduled_search(oracle, schedule or [], min_k, max_k)
+    raise ValueError(f"Unknown bound search strategy: {strategy}")
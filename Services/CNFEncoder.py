@@ -0,0 +1,212 @@
+from array import array
+
+from Services.Formulizer import reachable_mask
+
+AMO_SEQUENTIAL = "sequential"
+AMO_COMMANDER = "commander"
+
+
+class CNF:
+    """
+    A CNF formula over integer literals, stored as a flat array of zero terminated clauses.
+    """
+    def __init__(self):
+        """
+        Initialize an empty CNF formula.
+        """
+        self.num_vars = 0
+        self.num_clauses = 0
+        self.literals = array('i')
+
+    def new_var(self):
+        """
+        Allocate a new variable.
+
+        Returns:
+            int: The index of the new variable (starting from 1).
+        """
+        self.num_vars += 1
+        return self.num_vars
+
+    def add_clause(self, clause):
+        """
+        Add a clause to the formula.
+
+        Args:
+            clause (list): The literals of the clause, a negative literal is the negation of its variable.
+        """
+        self.literals.extend(clause)
+        self.literals.append(0)
+        self.num_clauses += 1
+
+    def clauses(self):
+        """
+        Iterate over the clauses of the formula.
+
+        Returns:
+            generator: Each clause as a list of literals.
+        """
+        clause = []
+        for lit in self.literals:
+            if lit == 0:
+                yield clause
+                clause = []
+            else:
+                clause.append(lit)
+
+    def to_dimacs(self):
+        """
+        Serialize the formula to the DIMACS CNF format.
+
+        Returns:
+            str: The formula in DIMACS format.
+        """
+        body = ' '.join(map(str, self.literals)).replace(' 0 ', ' 0\n')
+        return f"p cnf {self.num_vars} {self.num_clauses}\n{body}\n"
+
+
+def at_most_one(cnf, lits, encoding=AMO_SEQUENTIAL):
+    """
+    Encode that at most one of the given literals is true.
+
+    Args:
+        cnf (CNF): The formula to add the clauses to.
+        lits (list): The literals.
+        encoding (str): AMO_SEQUENTIAL for the sequential counter encoding or AMO_COMMANDER for the commander
+            encoding.
+    """
+    if len(lits) <= 4:
+        at_most_one_pairwise(cnf, lits)
+    elif encoding == AMO_SEQUENTIAL:
+        at_most_one_sequential(cnf, lits)
+    elif encoding == AMO_COMMANDER:
+        at_most_one_commander(cnf, lits)
+    else:
+        raise ValueError(f"Unknown at most one encoding: {encoding}")
+
+
+def at_most_one_pairwise(cnf, lits):
+    """
+    Encode at most one with a clause for every pair of literals.
+
+    Args:
+        cnf (CNF): The formula to add the clauses to.
+        lits (list): The literals.
+    """
+    for i in range(len(lits)):
+        for j in range(i + 1, len(lits)):
+            cnf.add_clause([-lits[i], -lits[j]])
+
+
+def at_most_one_sequential(cnf, lits):
+    """
+    Encode at most one with a sequential counter (Sinz), using len(lits) - 1 auxiliary variables.
+
+    Args:
+        cnf (CNF): The formula to add the clauses to.
+        lits (list): The literals.
+    """
+    prev = cnf.new_var()
+    cnf.add_clause([-lits[0], prev])
+    for lit in lits[1:-1]:
+        cur = cnf.new_var()
+        cnf.add_clause([-lit, cur])
+        cnf.add_clause([-prev, cur])
+        cnf.add_clause([-lit, -prev])
+        prev = cur
+    cnf.add_clause([-lits[-1], -prev])
+
+
+def at_most_one_commander(cnf, lits, group_size=3):
+    """
+    Encode at most one with the commander encoding, recursing on the commander variables.
+
+    Args:
+        cnf (CNF): The formula to add the clauses to.
+        lits (list): The literals.
+        group_size (int): The number of literals under each commander.
+    """
+    commanders = []
+    for i in range(0, len(lits), group_size):
+        group = lits[i:i + group_size]
+        commander = cnf.new_var()
+        at_most_one_pairwise(cnf, group)
+        for lit in group:
+            cnf.add_clause([-lit, commander])
+        cnf.add_clause([-commander] + group)
+        commanders.append(commander)
+    at_most_one(cnf, commanders, AMO_COMMANDER)
+
+
+def encode(M2, n, k, prune=True, amo=AMO_SEQUENTIAL):
+    """
+    Encode the system constraints directly into CNF, following Formulizer.formulise.
+
+    Args:
+        M2 (Kripke): The Kripke structure.
+        n (int): Size of the grid.
+        k (int): Number of time steps.
+        prune (bool): Only create variables for the cells of Formulizer.reachable_mask.
+        amo (str): The at most one encoding of the single path condition.
+
+    Returns:
+        tuple: The CNF formula and a 3D list of the variable of every cell at every time step (0 if pruned).
+    """
+    cnf = CNF()
+    if k < (2 * n) - 1:
+        cnf.add_clause([])
+        return cnf, [[[0] * n for _ in range(n)] for _ in range(k)]
+
+    mask = reachable_mask(M2, n, k).tolist() if prune else None
+    var_map = [[[cnf.new_var() if mask is None or mask[t][r][c] else 0 for c in range(n)] for r in range(n)]
+               for t in range(k)]
+
+    # Initial and final positions
+    cnf.add_clause([var_map[0][0][0]] if var_map[0][0][0] else [])
+    cnf.add_clause([var_map[k - 1][n - 1][n - 1]] if var_map[k - 1][n - 1][n - 1] else [])
+
+    # Valid steps: with at most one position per step, a step is either staying or moving to one neighbour
+    for t in range(k - 1):
+        for r in range(n):
+            for c in range(n):
+                if not var_map[t][r][c]:
+                    continue
+                clause = [-var_map[t][r][c]]
+                for rr, cc in ((r, c), (r - 1, c), (r + 1, c), (r, c + 1), (r, c - 1)):
+                    if 0 <= rr < n and 0 <= cc < n and var_map[t + 1][rr][cc]:
+                        clause.append(var_map[t + 1][rr][cc])
+                cnf.add_clause(clause)
+
+    # Safety
+    if mask is None:
+        for t in range(k):
+            for r, c in M2.state_at(t).occupied_cells():
+                cnf.add_clause([-var_map[t][r][c]])
+
+    # Single path
+    for t in range(k):
+        lits = [var for row in var_map[t] for var in row if var]
+        if len(lits) > 1:
+            at_most_one(cnf, lits, amo)
+
+    return cnf, var_map
+
+
+def decode(var_map, true_vars):
+    """
+    Decode the agent's path from a satisfying assignment.
+
+    Args:
+        var_map (list): The variables of the cells, as returned by encode.
+        true_vars (set): The variables assigned True.
+
+    Returns:
+        list: The (row, column) position of the agent at every time step.
+    """
+    solution = []
+    for step in var_map:
+        for r, row in enumerate(step):
+            for c, var in enumerate(row):
+                if var and var in true_vars:
+                    solution.append((r, c))
+    return solution
@@ -1,20 +1,231 @@
+import hashlib
+import mmap
+import os
 import pickle  # Importing the pickle module for object serialization.
+import struct
+import tempfile
+from collections.abc import Sequence
 
+import numpy as np
 
-def system_to_file(path, system):
+from Models.Kripke import Kripke
+from Models.Node import Node
+from Models.Robot import Robot
+from Models.System import System
+from Services.KripkeGenerator import generate_from_system
+
+# Binary .sys format, little endian:
+#   header      HEADER (magic, version, flags, n, nodes, edges, initial index, final index, robots)
+#   occupancy   one bitmask of ceil(n * n / 8) bytes per node (bit row * n + column, see Node.occupancy)
+#   edges       (source, target) node index pairs as uint32, sorted by source
+#   robots      per robot: ROBOT_HEADER (initial row, initial column, cells) then MOVEMENT_DTYPE per cell
+# The robots are the system itself, the nodes and edges are an optional cache of its Kripke structure
+# (FLAG_KRIPKE). Version 1 files always hold the Kripke structure.
+MAGIC = b"BMCSYS\x00\x00"
+VERSION = 2
+FLAG_KRIPKE = 1
+HEADER = struct.Struct("<8sHHIIIiiI")
+ROBOT_HEADER = struct.Struct("<iiI")
+MOVEMENT_DTYPE = np.dtype([("row", "<u2"), ("column", "<u2"), ("moves", "u1")])
+MOVES = ("right", "left", "up", "down", "stay")
+# Prefix of the temporary files system_to_file writes next to the target
+TEMP_PREFIX = ".sys-"
+
+# Classes a legacy pickled .sys file may contain
+LEGACY_CLASSES = {
+    ("Models.Kripke", "Kripke"), ("Models.Node", "Node"), ("Models.Lasso", "Lasso"), ("Models.System", "System"),
+    ("Models.Robot", "Robot"), ("Models.Robot", "Movement"), ("builtins", "set"), ("builtins", "frozenset"),
+}
+
+
+class LegacyUnpickler(pickle.Unpickler):
+    """
+    Unpickler of the legacy pickled .sys files, refusing every class other than the models.
     """
-    Serialize the given system object to a file.
+    def find_class(self, module, name):
+        """
+        Resolve a class of the pickle.
+
+        Args:
+            module (str): The module of the class.
+            name (str): The name of the class.
+
+        Returns:
+            type: The class, if it is one of LEGACY_CLASSES.
+        """
+        if (module, name) not in LEGACY_CLASSES:
+            raise pickle.UnpicklingError(f"Forbidden class in system file: {module}.{name}")
+        return super().find_class(module, name)
+
+
+class LazyNodes(Sequence):
+    """
+    Read only list of the nodes of a binary .sys file, creating every Node from the (memory mapped) occupancy
+    section the first time it is accessed.
+    """
+    def __init__(self, buffer, offset, count, n, initial, final):
+        """
+        Initialize the list.
+
+        Args:
+            buffer: The content of the file (bytes or mmap).
+            offset (int): Offset of the occupancy section in the buffer.
+            count (int): The number of nodes.
+            n (int): The size of the grid (n x n).
+            initial (int): Index of the initial node, or -1.
+            final (int): Index of the final node, or -1.
+        """
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+        self.n = n
+        self.row_bytes = ((n * n) + 7) // 8
+        self.initial = initial
+        self.final = final
+        self.cache = {}
+
+    def __len__(self):
+        """
+        Get the number of nodes.
+
+        Returns:
+            int: The number of nodes.
+        """
+        return self.count
+
+    def __getitem__(self, index):
+        """
+        Get a node.
+
+        Args:
+            index (int): Index of the node (its ID), or a slice.
+
+        Returns:
+            Node: The node, or a list of nodes for a slice.
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("node index out of range")
+        if index not in self.cache:
+            if self.buffer is None:
+                raise ValueError("The system file of the node is closed")
+            node = Node(index, index == self.initial, index == self.final, self.n)
+            start = self.offset + (index * self.row_bytes)
+            node.occupancy = int.from_bytes(self.buffer[start:start + self.row_bytes], 'little')
+            self.cache[index] = node
+        return self.cache[index]
+
+    def close(self):
+        """
+        Release the memory map of the file, so it can be replaced or deleted. The nodes already accessed stay
+        available, accessing another one raises ValueError.
+        """
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.buffer = None
+
+    def __reduce__(self):
+        """
+        Pickle the nodes as a plain list, as the memory map cannot be pickled (e.g. to send a loaded Kripke
+        structure to a worker process).
+
+        Returns:
+            tuple: The list constructor and the nodes.
+        """
+        return list, (list(self),)
+
+
+def system_to_file(path, system, n, kripke=None):
+    """
+    Serialize the given system object to a file in the binary .sys format.
 
     Args:
         path (str): The path to the file where the serialized data will be stored.
-        system (object): The object representing the system to be serialized.
+        system (System): The system to be serialized, or None if only its Kripke structure is known.
+        n (int): The size of the grid (n x n).
+        kripke (Kripke): The Kripke structure of the system to store as well, sparing its generation on load,
+            or None. Required if system is None.
 
     Returns:
         None
     """
-    with open(path, "wb") as bin_file:
-        bin_data = pickle.dumps(system)
-        bin_file.write(bin_data)
+    robots = system.robots if system is not None else []
+    nodes = list(kripke.nodes) if kripke is not None else []
+    index = {node.node_id: i for i, node in enumerate(nodes)}
+    initial = index.get(kripke.initial_id, -1) if kripke is not None else -1
+    final = index.get(kripke.final_id, -1) if kripke is not None else -1
+    row_bytes = ((n * n) + 7) // 8
+    relations = kripke.relations if kripke is not None else {}
+    edges = np.array(sorted((index[source], index[target]) for source, targets in relations.items()
+                            for target in targets), dtype="<u4").reshape(-1, 2)
+    flags = FLAG_KRIPKE if kripke is not None else 0
+
+    # Written to a temporary file replacing the target at the end: the nodes of a lazily loaded Kripke structure
+    # are read from the memory mapped file being saved over
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=TEMP_PREFIX, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as bin_file:
+            bin_file.write(HEADER.pack(MAGIC, VERSION, flags, n, len(nodes), len(edges), initial, final,
+                                       len(robots)))
+            bin_file.write(b"".join(node.occupancy.to_bytes(row_bytes, 'little') for node in nodes))
+            bin_file.write(edges.tobytes())
+            for robot in robots:
+                bin_file.write(robot_to_bytes(robot))
+        # Every node has been read, so the map of a lazily loaded structure (maybe of this very file) can go
+        close_system(kripke)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def robot_to_bytes(robot):
+    """
+    Serialize the movement map of a robot.
+
+    Args:
+        robot (Robot): The robot.
+
+    Returns:
+        bytes: The robot section of the binary .sys format.
+    """
+    cells = np.zeros(len(robot.movement_map), dtype=MOVEMENT_DTYPE)
+    for i, ((row, column), movement) in enumerate(sorted(robot.movement_map.items())):
+        moves = sum(1 << bit for bit, move in enumerate(MOVES) if getattr(movement, move))
+        cells[i] = (row, column, moves)
+    initial = robot.initial_pos if robot.initial_pos is not None else (-1, -1)
+    return ROBOT_HEADER.pack(initial[0], initial[1], len(cells)) + cells.tobytes()
+
+
+def system_hash(system, n):
+    """
+    Get the canonical hash of a system, equal for systems with the same robots in any order.
+
+    Args:
+        system (System): The system.
+        n (int): The size of the grid (n x n).
+
+    Returns:
+        str: The SHA-256 hex digest of the grid size and the sorted robot sections of the binary .sys format.
+    """
+    digest = hashlib.sha256(n.to_bytes(4, "little"))
+    for robot in sorted(robot_to_bytes(robot) for robot in system.robots):
+        digest.update(robot)
+    return digest.hexdigest()
+
+
+def close_system(kripke):
+    """
+    Release the memory map of a lazily loaded Kripke structure (see LazyNodes.close), if it has one.
+
+    Args:
+        kripke (Kripke): The Kripke structure, or None.
+    """
+    if kripke is not None and isinstance(kripke.nodes, LazyNodes):
+        kripke.nodes.close()
 
 
 def system_from_file(path):
@@ -25,8 +236,79 @@ def system_from_file(path):
         path (str): The path to the file containing the serialized data.
 
     Returns:
-        object: The deserialized system object.
+        Kripke: The Kripke structure of the system, generated from its robots if the file does not hold it.
+    """
+    system, n, kripke = load_system(path)
+    return kripke if kripke is not None else generate_from_system(system, n)
+
+
+def load_system(path, lazy=True):
+    """
+    Load a system file, in the binary .sys format or the legacy pickled one.
+
+    Args:
+        path (str): The path to the file.
+        lazy (bool): Memory map the file and create the nodes when they are accessed, instead of reading them all.
+            The map is held by the Kripke structure until close_system is called.
+
+    Returns:
+        tuple: The system (None for legacy files, which only hold the Kripke structure), the size of the grid and
+            the Kripke structure (None if the file does not hold it, see KripkeGenerator.generate_from_system).
     """
     with open(path, "rb") as bin_file:
-        kripke = pickle.load(bin_file)
-        return kripke
+        if bin_file.read(len(MAGIC)) != MAGIC:
+            bin_file.seek(0)
+            kripke = LegacyUnpickler(bin_file).load()
+            return None, kripke.n, kripke
+        if lazy:
+            buffer = mmap.mmap(bin_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            bin_file.seek(0)
+            buffer = bin_file.read()
+
+    _, version, flags, n, num_nodes, num_edges, initial, final, num_robots = HEADER.unpack_from(buffer)
+    if version not in (1, VERSION):
+        raise ValueError(f"Unsupported system file version: {version}")
+
+    nodes = LazyNodes(buffer, HEADER.size, num_nodes, n, initial, final)
+    offset = HEADER.size + (num_nodes * nodes.row_bytes)
+    edges = np.frombuffer(buffer, dtype="<u4", count=2 * num_edges, offset=offset).reshape(-1, 2)
+    offset += edges.nbytes
+
+    kripke = None
+    if version == 1 or flags & FLAG_KRIPKE:
+        kripke = Kripke(n)
+        kripke.nodes = nodes if lazy else list(nodes)
+        kripke.count = num_nodes
+        kripke.initial_id = initial if initial >= 0 else None
+        kripke.final_id = final if final >= 0 else None
+        for source, target in edges.tolist():
+            kripke.add_relation_by_id(source, target)
+
+    system = System()
+    for _ in range(num_robots):
+        robot, offset = robot_from_bytes(buffer, offset)
+        system.add_robot(robot)
+    # A file without robots only holds the Kripke structure (a legacy system saved again)
+    return (system if num_robots or kripke is None else None), n, kripke
+
+
+def robot_from_bytes(buffer, offset):
+    """
+    Deserialize the movement map of a robot.
+
+    Args:
+        buffer: The content of the file (bytes or mmap).
+        offset (int): Offset of the robot section in the buffer.
+
+    Returns:
+        tuple: The robot and the offset following its section.
+    """
+    initial_row, initial_column, count = ROBOT_HEADER.unpack_from(buffer, offset)
+    offset += ROBOT_HEADER.size
+    cells = np.frombuffer(buffer, dtype=MOVEMENT_DTYPE, count=count, offset=offset)
+    robot = Robot()
+    for row, column, moves in cells.tolist():
+        right, left, up, down, stay = ((moves >> bit) & 1 == 1 for bit in range(len(MOVES)))
+        robot.add_movement(row, column, right, left, up, down, stay, (row, column) == (initial_row, initial_column))
+    return robot, offset + cells.nbytes
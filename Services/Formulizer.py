@@ -1,21 +1,128 @@
-from z3 import Bool, Implies, And, Or, AtMost, PbEq
+import numpy as np
+from z3 import Bool, Implies, Not, Or, AtMost, PbEq
 
+from Services.Interruption import checkpoint
+from Services.Profiler import phase, count
 
-def create_base(n, k):
+
+def create_base(n, k, mask=None, ctx=None, interruption=None):
     """
     Create a base grid of Boolean variables.
 
     Args:
         n (int): Size of the grid.
         k (int): Number of time steps.
+        mask (list): A 3D list marking the cells that get a variable at each time step, or None for every cell.
+        ctx (z3.Context): The context of the variables, or None for the global context.
+        interruption (Interruption): Checked before every time step, or None.
 
     Returns:
-        list: A 3D list representing the base grid.
+        list: A 3D list representing the base grid, holding None for the pruned cells.
+
+    Raises:
+        Interrupted: If the interruption requires to stop.
     """
-    base = [[[Bool(f'p_{t}_{r}_{c}') for c in range(n)] for r in range(n)] for t in range(k)]
+    base = []
+    for t in range(k):
+        checkpoint(interruption)
+        base.append(create_step(n, t, None if mask is None else mask[t], ctx))
     return base
 
 
+def create_step(n, t, mask=None, ctx=None):
+    """
+    Create the grid of Boolean variables of a single time step.
+
+    Args:
+        n (int): Size of the grid.
+        t (int): The time step.
+        mask (list): A 2D list or array marking the cells that get a variable, or None for every cell.
+        ctx (z3.Context): The context of the variables, or None for the global context.
+
+    Returns:
+        list: A 2D list of the variables p_t_r_c, holding None for the pruned cells.
+    """
+    mask = None if mask is None else np.asarray(mask, dtype=bool).tolist()
+    return [[Bool(f'p_{t}_{r}_{c}', ctx) if mask is None or mask[r][c] else None for c in range(n)] for r in range(n)]
+
+
+def step_mask(node, n, t, k=None):
+    """
+    Mark the cells the agent can occupy at time step t.
+
+    A cell is kept if it is within Manhattan distance t of the start, within distance k - 1 - t of the goal
+    and is not occupied by a counter agent at time step t.
+
+    Args:
+        node (Node): The Kripke node the counter agents are in at time step t.
+        n (int): Size of the grid.
+        t (int): The time step.
+        k (int): Number of time steps, or None to skip the distance to goal check (bound not yet known).
+
+    Returns:
+        numpy.ndarray: A boolean array of shape (n, n).
+    """
+    distance = np.add.outer(np.arange(n), np.arange(n))
+    mask = (distance <= t) & ~occupancy_grid(node.occupancy, n)
+    if k is not None:
+        mask &= (2 * (n - 1)) - distance <= k - 1 - t
+    return mask
+
+
+def reachable_mask(M2, n, k):
+    """
+    Mark the cells the agent can occupy at every time step (the cone of influence of the path).
+
+    Args:
+        M2 (object): Object representing the system.
+        n (int): Size of the grid.
+        k (int): Number of time steps.
+
+    Returns:
+        numpy.ndarray: A boolean array of shape (k, n, n).
+    """
+    distance = np.add.outer(np.arange(n), np.arange(n))
+    steps = np.arange(k).reshape(k, 1, 1)
+    return (distance <= steps) & ((2 * (n - 1)) - distance <= k - 1 - steps) & ~occupancy_array(M2, n, k)
+
+
+def occupancy_grid(occupancy, n):
+    """
+    Unpack an occupancy bitmask into a grid.
+
+    Args:
+        occupancy (int): The occupancy bitmask (see Node.occupancy).
+        n (int): Size of the grid.
+
+    Returns:
+        numpy.ndarray: A boolean array of shape (n, n), True where the cell is occupied.
+    """
+    packed = np.frombuffer(occupancy.to_bytes(((n * n) + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(packed, count=n * n, bitorder='little').reshape(n, n).astype(bool)
+
+
+def occupancy_array(M2, n, k):
+    """
+    Stack the occupancy of the system at every time step.
+
+    Args:
+        M2 (object): Object representing the system.
+        n (int): Size of the grid.
+        k (int): Number of time steps.
+
+    Returns:
+        numpy.ndarray: A boolean array of shape (k, n, n), True where the cell is occupied at the time step.
+    """
+    grids = {}
+    occupancy = np.empty((k, n, n), dtype=bool)
+    for t in range(k):
+        bits = M2.occupancy_at(t)
+        if bits not in grids:
+            grids[bits] = occupancy_grid(bits, n)
+        occupancy[t] = grids[bits]
+    return occupancy
+
+
 def alpha_initial(base):
     """
     Define the initial position.
@@ -24,12 +131,14 @@ def alpha_initial(base):
         base (list): The base grid.
 
     Returns:
-        z3.BoolRef: The Boolean variable representing the initial position.
+        z3.BoolRef: The Boolean variable representing the initial position, or False if it was pruned.
     """
+    if base[0][0][0] is None:
+        return False
     return base[0][0][0]
 
 
-def alpha_final(base, n, k):
+def alpha_final(base, n, k, within=False):
     """
     Define the final position.
 
@@ -37,14 +146,20 @@ def alpha_final(base, n, k):
         base (list): The base grid.
         n (int): Size of the grid.
         k (int): Number of time steps.
+        within (bool): Reach the goal at any of the k time steps instead of exactly at the last one.
 
     Returns:
-        z3.BoolRef: The Boolean variable representing the final position.
+        z3.BoolRef: The Boolean formula representing the final position, or False if it was pruned.
     """
+    if within:
+        goals = [base[t][n - 1][n - 1] for t in range(k) if base[t][n - 1][n - 1] is not None]
+        return Or(goals) if goals else False
+    if base[k - 1][n - 1][n - 1] is None:
+        return False
     return base[k - 1][n - 1][n - 1]
 
 
-def alpha_k(base, n, k):
+def alpha_k(base, n, k, within=False, interruption=None):
     """
     Define valid steps.
 
@@ -52,38 +167,19 @@ def alpha_k(base, n, k):
         base (list): The base grid.
         n (int): Size of the grid.
         k (int): Number of time steps.
+        within (bool): The path ends on reaching the goal (see step_k).
+        interruption (Interruption): Checked before every time step, or None.
 
     Returns:
-        z3.BoolRef: A Boolean formula representing valid steps.
+        list: The constraints representing valid steps.
+
+    Raises:
+        Interrupted: If the interruption requires to stop.
     """
-    alph_k = (k >= ((2 * n) - 1))
+    alph_k = [k >= ((2 * n) - 1)]
     for t in range(k - 1):
-        for r in range(n):
-            for c in range(n):
-                left = right = up = down = True
-                total = []
-                if c == 0:
-                    left = False
-                elif c == n - 1:
-                    right = False
-                if r == 0:
-                    up = False
-                elif r == n - 1:
-                    down = False
-
-                if up:
-                    total.append(base[t + 1][r - 1][c])
-                if down:
-                    total.append(base[t + 1][r + 1][c])
-                if right:
-                    total.append(base[t + 1][r][c + 1])
-                if left:
-                    total.append(base[t + 1][r][c - 1])
-
-                # Stay
-                # total.append(base[t + 1][r][c])
-                alph_k = And(alph_k,
-                             Implies(base[t][r][c], Or(base[t + 1][r][c], PbEq([(var, 1) for var in total], 1))))
+        checkpoint(interruption)
+        alph_k.extend(step_k(base, n, t, within))
     return alph_k
 
 
@@ -98,20 +194,13 @@ def alpha_s(base, M2, n, k):
         k (int): Number of time steps.
 
     Returns:
-        z3.BoolRef: A Boolean formula representing safety conditions.
+        list: The negation of the variable of every occupied cell (the free cells need no constraint).
     """
-    current = M2.get_initial_state()
-    s = True
-    for t in range(k):
-        for row in range(n):
-            for col in range(n):
-                s = And(s, Implies(base[t][row][col], not current.properties[row][col]))
-        current = M2.nodes[next(iter((M2.relations[current.node_id])))]
-
-    return s
+    return [Not(base[t][row][col]) for t, row, col in np.argwhere(occupancy_array(M2, n, k)).tolist()
+            if base[t][row][col] is not None]
 
 
-def alpha_sp(base, n, k):
+def alpha_sp(base, n, k, interruption=None):
     """
     Define single path conditions.
 
@@ -119,22 +208,114 @@ def alpha_sp(base, n, k):
         base (list): The base grid.
         n (int): Size of the grid.
         k (int): Number of time steps.
+        interruption (Interruption): Checked before every time step, or None.
 
     Returns:
-        z3.BoolRef: A Boolean formula representing single path conditions.
+        list: The constraints representing single path conditions.
+
+    Raises:
+        Interrupted: If the interruption requires to stop.
     """
-    formula = True
+    formula = []
     for t in range(k):
-        # Create a list of all variables in base[t]
-        variables_in_base_t = [base[t][r][c] for r in range(n) for c in range(n)]
-
-        # Perform AtMost on all variables in base[t]
-        formula = And(AtMost(*variables_in_base_t, 1), formula)
+        checkpoint(interruption)
+        formula.extend(step_sp(base, n, t))
 
     return formula
 
 
-def formulise(M2, n, k):
+def step_k(base, n, t, within=False, halt=None):
+    """
+    Define the valid steps from time step t to time step t + 1.
+
+    Args:
+        base (list): The base grid, holding at least t + 2 time steps.
+        n (int): Size of the grid.
+        t (int): The time step.
+        within (bool): The path ends on reaching the goal, so the goal cell has no next step. Reaching the goal
+            within k steps is then monotone in k, as the path does not have to stay safe after its arrival.
+        halt (z3.BoolRef): A literal letting the path end at time step t instead of moving on, or None. It is up to
+            the caller to constrain where the path may end.
+
+    Returns:
+        list: The transition constraints of every cell at time step t.
+    """
+    constraints = []
+    for r in range(n):
+        for c in range(n):
+            if base[t][r][c] is None or (within and r == n - 1 and c == n - 1):
+                continue
+            left = right = up = down = True
+            total = []
+            if c == 0:
+                left = False
+            elif c == n - 1:
+                right = False
+            if r == 0:
+                up = False
+            elif r == n - 1:
+                down = False
+
+            if up:
+                total.append(base[t + 1][r - 1][c])
+            if down:
+                total.append(base[t + 1][r + 1][c])
+            if right:
+                total.append(base[t + 1][r][c + 1])
+            if left:
+                total.append(base[t + 1][r][c - 1])
+
+            # Stay
+            # total.append(base[t + 1][r][c])
+            total = [var for var in total if var is not None]
+            stay = base[t + 1][r][c]
+            if not total:
+                valid = False if stay is None else stay
+            elif stay is None:
+                valid = PbEq([(var, 1) for var in total], 1)
+            else:
+                valid = Or(stay, PbEq([(var, 1) for var in total], 1))
+            if halt is not None:
+                valid = Or(valid, halt)
+            constraints.append(Implies(base[t][r][c], valid))
+    return constraints
+
+
+def step_s(base, node, n, t):
+    """
+    Define the safety conditions of time step t.
+
+    Args:
+        base (list): The base grid.
+        node (Node): The Kripke node the counter agents are in at time step t.
+        n (int): Size of the grid.
+        t (int): The time step.
+
+    Returns:
+        list: The negation of the variable of every occupied cell at time step t.
+    """
+    return [Not(base[t][row][col]) for row, col in node.occupied_cells() if base[t][row][col] is not None]
+
+
+def step_sp(base, n, t):
+    """
+    Define the single path condition of time step t.
+
+    Args:
+        base (list): The base grid.
+        n (int): Size of the grid.
+        t (int): The time step.
+
+    Returns:
+        list: The single path constraints of time step t.
+    """
+    variables_in_base_t = [base[t][r][c] for r in range(n) for c in range(n) if base[t][r][c] is not None]
+    if len(variables_in_base_t) < 2:
+        return []
+    return [AtMost(*variables_in_base_t, 1)]
+
+
+def formulise(M2, n, k, prune=True, ctx=None, within=False, profiler=None, interruption=None):
     """
     Formulate the entire system constraints.
 
@@ -142,15 +323,53 @@ def formulise(M2, n, k):
         M2 (object): Object representing the system.
         n (int): Size of the grid.
         k (int): Number of time steps.
+        prune (bool): Only create variables for the cells of reachable_mask. The unsafe cells are dropped,
+            so no safety constraints are needed.
+        ctx (z3.Context): The context to build the formula in, or None for the global context.
+        within (bool): Look for a path reaching the goal within k time steps instead of exactly at the last one.
+        profiler (Profiler): Profiler timing every phase and counting its constraints, or None.
+        interruption (Interruption): Cancellation request and deadline, checked between the phases and the time
+            steps, or None.
 
     Returns:
-        z3.BoolRef: A Boolean formula representing the entire system constraints.
+        list: A flat list of the constraints of the entire system, to be added to a solver with solver.add(*clauses).
+
+    Raises:
+        Interrupted: If the interruption requires to stop.
     """
-    base = create_base(n, k)
+    with phase(profiler, "reachable_mask"):
+        mask = reachable_mask(M2, n, k) if prune else None
+    with phase(profiler, "create_base"):
+        base = create_base(n, k, mask, ctx, interruption)
     a_i = alpha_initial(base)
-    a_f = alpha_final(base, n, k)
-    a_k = alpha_k(base, n, k)
-    a_s = alpha_s(base, M2, n, k)
-    a_sp = alpha_sp(base, n, k)
+    a_f = alpha_final(base, n, k, within)
+    with phase(profiler, "alpha_k"):
+        a_k = alpha_k(base, n, k, within, interruption)
+    checkpoint(interruption)
+    with phase(profiler, "alpha_s"):
+        a_s = [] if prune else alpha_s(base, M2, n, k)
+    with phase(profiler, "alpha_sp"):
+        a_sp = alpha_sp(base, n, k, interruption)
+    count(profiler, "alpha_k", len(a_k))
+    count(profiler, "alpha_s", len(a_s))
+    count(profiler, "alpha_sp", len(a_sp))
+
+    return a_sp + [a_i, a_f] + a_k + a_s
+
+
+def count_variables(M2, n, k, prune=True):
+    """
+    Count the cell variables formulise creates.
 
-    return And(a_sp, a_i, a_f, a_k, a_s)
+    Args:
+        M2 (object): Object representing the system.
+        n (int): Size of the grid.
+        k (int): Number of time steps.
+        prune (bool): Whether the variables are pruned to reachable_mask.
+
+    Returns:
+        int: The number of p_t_r_c variables.
+    """
+    if not prune:
+        return n * n * k
+    return int(reachable_mask(M2, n, k).sum())
@@ -0,0 +1,133 @@
+import time
+
+from z3 import sat, unsat
+
+
+def shift_masks(n):
+    """
+    Get the masks used to move a set of cells by one step.
+
+    Args:
+        n (int): Size of the grid.
+
+    Returns:
+        tuple: The mask of the whole grid, the mask of the grid without its first column and the mask of the grid
+            without its last column.
+    """
+    full = (1 << (n * n)) - 1
+    first_column = sum(1 << (row * n) for row in range(n))
+    last_column = first_column << (n - 1)
+    return full, full & ~first_column, full & ~last_column
+
+
+def expand(reach, n, masks):
+    """
+    Get the cells reachable in one step (staying or moving to a neighbour) from a set of cells.
+
+    Args:
+        reach (int): The set of cells as a bitmask (bit row * n + column).
+        n (int): Size of the grid.
+        masks (tuple): The masks returned by shift_masks.
+
+    Returns:
+        int: The reachable cells as a bitmask, ignoring the occupancy.
+    """
+    full, not_first, not_last = masks
+    return (reach | (reach >> n) | ((reach << n) & full) |
+            ((reach << 1) & not_first) | ((reach >> 1) & not_last))
+
+
+def shortest_path(n, M2, max_k=None, start=(0, 0), goal=None, start_time=0, deadline=None):
+    """
+    Search for the shortest path with a breadth first search over (time step, cell).
+
+    The cells reachable at every time step are kept as a single bitmask, so a step of the search is a few shifts
+    of the previous one minus the occupancy of the next state. Since the counter agents run on a lasso, the
+    search can also stop as soon as a (phase, reachable cells) pair repeats: the following steps would repeat
+    as well, so the goal is unreachable at any bound.
+
+    Args:
+        n (int): Size of the grid.
+        M2 (object): Object representing the system (Kripke or PeriodicSystem).
+        max_k (int): The longest path length to check, or None to search until the goal is proven unreachable.
+        start (tuple): The (row, column) the agent starts from.
+        goal (tuple): The (row, column) the agent must reach, or None for (n - 1, n - 1).
+        start_time (int): The time step of the system the agent starts at.
+        deadline (float): time.monotonic() time to give up by, or None for no deadline.
+
+    Returns:
+        tuple: A tuple containing the status (sat, unsat or "timeout"), the solution and its length (the minimal
+            k), or the last length checked if unsatisfiable or timed out.
+    """
+    goal = (n - 1, n - 1) if goal is None else goal
+    return shortest_paths(n, M2, [goal], max_k, start, start_time, deadline)[goal]
+
+
+def shortest_paths(n, M2, goals, max_k=None, start=(0, 0), start_time=0, deadline=None):
+    """
+    Search for the shortest paths from a start to several goals with a single breadth first search (see
+    shortest_path), stopping once every goal is reached or proven unreachable.
+
+    Args:
+        n (int): Size of the grid.
+        M2 (object): Object representing the system (Kripke or PeriodicSystem).
+        goals (list): The (row, column) of every goal.
+        max_k (int): The longest path length to check, or None to search until the goals are proven unreachable.
+        start (tuple): The (row, column) the agent starts from.
+        start_time (int): The time step of the system the agent starts at.
+        deadline (float): time.monotonic() time to give up by, checked at every layer, or None for no deadline.
+
+    Returns:
+        dict: The result of every goal, as returned by shortest_path.
+    """
+    pending = {goal: 1 << (goal[0] * n + goal[1]) for goal in goals}
+    results = {}
+    masks = shift_masks(n)
+    layers = [(1 << (start[0] * n + start[1])) & ~M2.occupancy_at(start_time)]
+    seen = {}
+    timed_out = False
+    while layers[-1] and pending:
+        k = len(layers)
+        for goal, goal_bit in list(pending.items()):
+            if layers[-1] & goal_bit:
+                results[goal] = sat, extract_path(layers, n, goal), k
+                del pending[goal]
+        if not pending or (max_k is not None and k >= max_k):
+            break
+        key = (M2.phase_at(start_time + k - 1), layers[-1])
+        if key in seen:
+            break
+        seen[key] = k
+        if deadline is not None and time.monotonic() >= deadline:
+            timed_out = True
+            break
+        layers.append(expand(layers[-1], n, masks) & ~M2.occupancy_at(start_time + k))
+    for goal in pending:
+        if timed_out:
+            results[goal] = "timeout", [], len(layers)
+        else:
+            results[goal] = unsat, [], len(layers) if max_k is None else max_k
+    return results
+
+
+def extract_path(layers, n, goal):
+    """
+    Walk back from the goal through the layers of the search.
+
+    Args:
+        layers (list): The cells reachable at every time step, as bitmasks.
+        n (int): Size of the grid.
+        goal (tuple): The (row, column) reached at the last layer.
+
+    Returns:
+        list: The (row, column) position of the agent at every time step.
+    """
+    solution = [goal]
+    for t in range(len(layers) - 2, -1, -1):
+        row, col = solution[-1]
+        for r, c in ((row, col), (row - 1, col), (row + 1, col), (row, col + 1), (row, col - 1)):
+            if 0 <= r < n and 0 <= c < n and (layers[t] >> (r * n + c)) & 1:
+                solution.append((r, c))
+                break
+    solution.reverse()
+    return solution
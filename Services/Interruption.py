@@ -0,0 +1,103 @@
+import time
+
+
+class Interrupted(Exception):
+    """
+    Raised when building or solving a formula must stop before it is done.
+
+    Attributes:
+        status (str): "cancelled" or "timeout".
+    """
+    def __init__(self, status):
+        """
+        Initialize the exception.
+
+        Args:
+            status (str): "cancelled" or "timeout".
+        """
+        super().__init__(status)
+        self.status = status
+
+
+class Interruption:
+    """
+    A cancellation request and a wall clock deadline, checked between the steps of the work, since interrupting
+    a Z3 context only stops a running check.
+    """
+    def __init__(self, stop_event=None, deadline=None):
+        """
+        Initialize the interruption.
+
+        Args:
+            stop_event (threading.Event): Cancellation request, or None.
+            deadline (float): time.monotonic() time the work must end by, or None for no deadline.
+        """
+        self.stop_event = stop_event
+        self.deadline = deadline
+
+    @classmethod
+    def start(cls, timeout_sec=None, stop_event=None, deadline=None):
+        """
+        Create the interruption of a piece of work starting now.
+
+        Args:
+            timeout_sec (float): Timeout of the whole work in seconds, or None for no timeout.
+            stop_event (threading.Event): Cancellation request, or None.
+            deadline (float): time.monotonic() time the work must end by at the latest, or None.
+
+        Returns:
+            Interruption: The interruption, its deadline being the earliest of the two.
+        """
+        if timeout_sec is not None:
+            end = time.monotonic() + timeout_sec
+            deadline = end if deadline is None else min(deadline, end)
+        return cls(stop_event, deadline)
+
+    def status(self):
+        """
+        Get whether the work must stop.
+
+        Returns:
+            str: "cancelled" if cancellation was requested, "timeout" if the deadline has passed, None otherwise.
+        """
+        if self.stop_event is not None and self.stop_event.is_set():
+            return "cancelled"
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "timeout"
+        return None
+
+    def check(self):
+        """
+        Stop the work if it must stop.
+
+        Raises:
+            Interrupted: If cancellation was requested or the deadline has passed.
+        """
+        status = self.status()
+        if status is not None:
+            raise Interrupted(status)
+
+    def remaining(self):
+        """
+        Get the time left before the deadline.
+
+        Returns:
+            float: The seconds left (at most 0 once passed), or None for no deadline.
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+
+def checkpoint(interruption):
+    """
+    Stop the work if an optional interruption requires it.
+
+    Args:
+        interruption (Interruption): The interruption, or None.
+
+    Raises:
+        Interrupted: If cancellation was requested or the deadline has passed.
+    """
+    if interruption is not None:
+        interruption.check()
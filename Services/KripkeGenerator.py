@@ -1,12 +1,17 @@
-import random as rand
+import logging
 
+import numpy as np
 from z3 import *
 
 from Models.Kripke import Kripke
+from Models.Lasso import Lasso
 from Models.Node import Node
+from Models.PeriodicSystem import PeriodicSystem
 from Models.Robot import Robot
 from Models.System import System
 
+logger = logging.getLogger(__name__)
+
 
 def generate_from_system(system, n):
     """
@@ -22,7 +27,6 @@ def generate_from_system(system, n):
     node_id = 0
     M2 = Kripke(n)
     robot_pos = {}
-    history = []
     initial_node = Node(node_id, True, False, n)
 
     # Initial Node Setup
@@ -33,41 +37,26 @@ def generate_from_system(system, n):
         robot_pos[i].add((system.robots[i].initial_pos[0], system.robots[i].initial_pos[1]))
 
     M2.add_node(initial_node)
+    # Node id of every configuration seen so far, the loop closes on the first repeated configuration
+    history = {canonical_configuration(robot_pos): node_id}
     hasClosedLoop = False
     nextNode = initial_node
 
     while not hasClosedLoop:
         node_id += 1
-        history.append(copy.copy(robot_pos))
         # Calculate possible whereabouts of each robot in the next step
         prevNode = nextNode
         nextNode = Node(node_id, False, False, n)
         for i in range(len(system.robots)):
-            future = set()
-            for possible_pos in robot_pos[i]:
-                move = system.robots[i].movement_get(possible_pos[0], possible_pos[1])
-                if move is None:
-                    raise Exception("The given system has a path with no closed loop")
-                if move.right:
-                    future.add((possible_pos[0], possible_pos[1] + 1))
-                if move.left:
-                    future.add((possible_pos[0], possible_pos[1] - 1))
-                if move.up:
-                    future.add((possible_pos[0] - 1, possible_pos[1]))
-                if move.down:
-                    future.add((possible_pos[0] + 1, possible_pos[1]))
-                if move.stay:
-                    future.add((possible_pos[0], possible_pos[1]))
-            robot_pos[i] = future
-
-        for i in range(len(history)):
-            # closed loop - finish
-            if history[i] == robot_pos:
-                hasClosedLoop = True
-                M2.add_relation(prevNode, M2.nodes[i])
-                break
+            robot_pos[i] = next_positions(system.robots[i], robot_pos[i])
 
-        if not hasClosedLoop:
+        configuration = canonical_configuration(robot_pos)
+        if configuration in history:
+            # closed loop - finish
+            hasClosedLoop = True
+            M2.add_relation(prevNode, M2.nodes[history[configuration]])
+        else:
+            history[configuration] = node_id
             for robot_positions in robot_pos:
                 for possible_pos in robot_pos[robot_positions]:
                     nextNode.add_property(True, possible_pos[0], possible_pos[1])
@@ -78,6 +67,87 @@ def generate_from_system(system, n):
     return M2
 
 
+def next_positions(robot, positions):
+    """
+    Calculate the possible whereabouts of a robot in the next step.
+
+    Args:
+        robot (Robot): The robot.
+        positions (set): The possible positions of the robot in the current step.
+
+    Returns:
+        set: The possible positions of the robot in the next step.
+    """
+    future = set()
+    for possible_pos in positions:
+        move = robot.movement_get(possible_pos[0], possible_pos[1])
+        if move is None:
+            raise Exception("The given system has a path with no closed loop")
+        if move.right:
+            future.add((possible_pos[0], possible_pos[1] + 1))
+        if move.left:
+            future.add((possible_pos[0], possible_pos[1] - 1))
+        if move.up:
+            future.add((possible_pos[0] - 1, possible_pos[1]))
+        if move.down:
+            future.add((possible_pos[0] + 1, possible_pos[1]))
+        if move.stay:
+            future.add((possible_pos[0], possible_pos[1]))
+    return future
+
+
+def generate_robot_lasso(robot, n):
+    """
+    Generate the lasso of the possible whereabouts of a single robot.
+
+    Args:
+        robot (Robot): The robot.
+        n (int): Size of the grid.
+
+    Returns:
+        Lasso: The occupancy bitmask of the robot at every step of its prefix and cycle.
+    """
+    positions = frozenset([robot.initial_pos])
+    history = {}
+    states = []
+    while positions not in history:
+        history[positions] = len(states)
+        occupancy = 0
+        for row, col in positions:
+            occupancy |= 1 << (row * n + col)
+        states.append(occupancy)
+        positions = frozenset(next_positions(robot, positions))
+    return Lasso(states, history[positions])
+
+
+def generate_periodic_system(system, n):
+    """
+    Generate the per robot decomposition of a system, an alternative to the product built by
+    generate_from_system whose size is the sum of the robots' periods instead of their least common multiple.
+
+    Args:
+        system (System): The system object.
+        n (int): Size of the grid.
+
+    Returns:
+        PeriodicSystem: The lasso of every robot.
+    """
+    return PeriodicSystem(n, [generate_robot_lasso(robot, n) for robot in system.robots])
+
+
+def canonical_configuration(robot_pos):
+    """
+    Freeze the possible positions of every robot into a hashable configuration.
+
+    Args:
+        robot_pos (dict): The set of possible positions of every robot, by robot index.
+
+    Returns:
+        tuple: A frozenset of positions per robot, in robot index order.
+    """
+    return tuple(frozenset(robot_pos[i]) for i in sorted(robot_pos))
+
+
 def create_M1(n):
     """
     Create the M1 Kripke structure.
@@ -130,7 +200,27 @@ def create_M1(n):
     return M1
 
 
-def auto_generate_system(n, num_counter_agents, stay_chance, stray_radius):
+# Order of the moves in the random draws of a cell, followed by the chance to stay
+DIRECTIONS = ((0, 1), (0, -1), (-1, 0), (1, 0))
+# Most rows of move and stay draws held at once while generating robots (a robot's rows are never split)
+DRAW_BATCH_ROWS = 1 << 16
+
+
+def make_rng(seed=None):
+    """
+    Get a random generator.
+
+    Args:
+        seed: An int or numpy.random.SeedSequence for a reproducible generator, a numpy.random.Generator to use as
+            is, or None for a generator seeded from the operating system.
+
+    Returns:
+        numpy.random.Generator: The random generator.
+    """
+    return np.random.default_rng(seed)
+
+
+def auto_generate_system(n, num_counter_agents, stay_chance, stray_radius, seed=None):
     """
     Automatically generate a system and its corresponding Kripke structure.
 
@@ -139,99 +229,153 @@ def auto_generate_system(n, num_counter_agents, stay_chance, stray_radius):
         num_counter_agents (int): Number of counter agents.
         stay_chance (float): Probability of staying in the same position.
         stray_radius (int): Maximum radius for straying from the initial position.
+        seed: The seed of the random generator, or the generator itself (see make_rng), None for a new system
+            every call.
 
     Returns:
         Tuple[System, Kripke]: A tuple containing the generated system and its corresponding Kripke structure.
     """
     generated_system = System()
-
-    for rnum in range(num_counter_agents):
-        generated_system.add_robot(auto_gen_robot(n, stay_chance, stray_radius))
+    for robot in auto_gen_robots(n, num_counter_agents, stay_chance, stray_radius, make_rng(seed)):
+        generated_system.add_robot(robot)
 
     return generated_system, generate_from_system(generated_system, n)
 
 
-def auto_gen_robot(n, stay_chance, stray_radius):
+def auto_generate_systems(n, num_systems, num_counter_agents, stay_chance, stray_radius, seed=None, kripke=True):
     """
-    Automatically generate a robot with random movements.
+    Automatically generate many systems with a single random generator, drawing the robots of all of them at once.
 
     Args:
         n (int): Size of the grid.
+        num_systems (int): Number of systems.
+        num_counter_agents (int): Number of counter agents of every system.
         stay_chance (float): Probability of staying in the same position.
         stray_radius (int): Maximum radius for straying from the initial position.
+        seed: The seed of the random generator, or the generator itself (see make_rng).
+        kripke (bool): Whether to generate the Kripke structure of every system as well.
 
     Returns:
-        Robot: The generated robot.
+        list: A tuple per system containing the system and its Kripke structure (None if kripke is False).
     """
-    robot = Robot()
-    initial_pos = (random_number(0, n - 1), random_number(0, n - 1))
-    print(f"initial: {initial_pos}")
-    can_initially_stay = has_happend(stay_chance)
-    if can_initially_stay:
-        minimal_stray_radius = 0
-    else:
-        minimal_stray_radius = 1
-
-    travel_distance = random_number(minimal_stray_radius, stray_radius)
-    robot.initial_pos = initial_pos
-    can_move_up = has_happend(0.5) and ((initial_pos[0] - 1) >= 0) and (travel_distance > 0)
-    can_move_down = has_happend(0.5) and ((initial_pos[0] + 1) < n) and (travel_distance > 0)
-    can_move_right = has_happend(0.5) and ((initial_pos[1] + 1) < n) and (travel_distance > 0)
-    can_move_left = has_happend(0.5) and ((initial_pos[1] - 1) >= 0) and (travel_distance > 0)
-    robot.add_movement(initial_pos[0], initial_pos[1], can_move_right, can_move_left, can_move_up, can_move_down,
-                       can_initially_stay, True)
-    current_pos = initial_pos
-
-    if (not can_move_up) and (not can_move_down) and (not can_move_left) and (not can_move_right):
-        can_initially_stay = True
-
-    robot.add_movement(initial_pos[0], initial_pos[1], can_move_right, can_move_left, can_move_up, can_move_down,
-                       can_initially_stay, True)
+    robots = auto_gen_robots(n, num_systems * num_counter_agents, stay_chance, stray_radius, make_rng(seed))
+    systems = []
+    for i in range(num_systems):
+        system = System()
+        for robot in robots[i * num_counter_agents:(i + 1) * num_counter_agents]:
+            system.add_robot(robot)
+        systems.append((system, generate_from_system(system, n) if kripke else None))
+    return systems
 
-    if can_move_right:
-        step((current_pos[0], current_pos[1] + 1), n, robot, initial_pos, stay_chance,
-             travel_distance)
 
-    if can_move_left:
-        step((current_pos[0], current_pos[1] - 1), n, robot, initial_pos, stay_chance,
-             travel_distance)
-
-    if can_move_up:
-        step((current_pos[0] - 1, current_pos[1]), n, robot, initial_pos, stay_chance,
-             travel_distance)
+def auto_gen_robot(n, stay_chance, stray_radius, rng=None):
+    """
+    Automatically generate a robot with random movements.
 
-    if can_move_down:
-        step((current_pos[0] + 1, current_pos[1]), n, robot, initial_pos, stay_chance,
-             travel_distance)
+    Args:
+        n (int): Size of the grid.
+        stay_chance (float): Probability of staying in the same position.
+        stray_radius (int): Maximum radius for straying from the initial position.
+        rng (numpy.random.Generator): The random generator, or None for a new one (see make_rng).
 
-    return robot
+    Returns:
+        Robot: The generated robot.
+    """
+    return auto_gen_robots(n, 1, stay_chance, stray_radius, rng)[0]
 
 
-def has_happend(chance):
+def auto_gen_robots(n, count, stay_chance, stray_radius, rng=None):
     """
-    Determine if an event has occurred based on a given probability.
+    Automatically generate robots with random movements.
+
+    The initial position, initial stay and travel distance of every robot are drawn at once, followed by a block
+    of move and stay draws per robot, one row for every cell it may reach within its travel distance. The blocks
+    are drawn for batches of robots of at most DRAW_BATCH_ROWS rows (or a single robot), so memory does not grow
+    with the number of robots, and the robots do not depend on the batches.
 
     Args:
-        chance (float): The probability of the event occurring.
+        n (int): Size of the grid.
+        count (int): Number of robots.
+        stay_chance (float): Probability of staying in the same position.
+        stray_radius (int): Maximum radius for straying from the initial position.
+        rng (numpy.random.Generator): The random generator, or None for a new one (see make_rng).
 
     Returns:
-        bool: True if the event has occurred, False otherwise.
+        list: The generated robots.
     """
-    return rand.random() < chance
-
-
-def random_number(min_num, max_num):
+    rng = make_rng(rng)
+    initial_positions = rng.integers(0, n, size=(count, 2)).tolist()
+    initial_stays = (rng.random(count) < stay_chance).tolist()
+    travel_distances = rng.integers(np.where(initial_stays, 0, 1), stray_radius + 1, size=count).tolist()
+    chances = np.array([0.5, 0.5, 0.5, 0.5, stay_chance])
+    sizes = [min(n, (2 * travel_distance) + 1) ** 2 for travel_distance in travel_distances]
+
+    robots = []
+    first = 0
+    while first < count:
+        # The robots of the batch, at least one
+        last = first + 1
+        rows = sizes[first]
+        while last < count and rows + sizes[last] <= DRAW_BATCH_ROWS:
+            rows += sizes[last]
+            last += 1
+        draws = rng.random((rows, len(chances))) < chances
+        offset = 0
+        for i in range(first, last):
+            initial_pos = tuple(initial_positions[i])
+            logger.debug("initial: %s", initial_pos)
+            robots.append(spread(n, initial_pos, initial_stays[i], travel_distances[i],
+                                 draws[offset:offset + sizes[i]]))
+            offset += sizes[i]
+        first = last
+    return robots
+
+
+def spread(n, initial_pos, can_initially_stay, travel_distance, draws):
     """
-    Generate a random integer within the specified range.
+    Build the movement map of a robot, visiting the cells it can reach depth first with an explicit stack.
+
+    A move is allowed if its draw happened, it stays on the grid and the robot is closer than the travel distance
+    to its initial position along the axis of the move. A cell without any allowed move can always stay.
 
     Args:
-        min (int): The minimum value of the range.
-        max (int): The maximum value of the range.
+        n (int): Size of the grid.
+        initial_pos (tuple): The initial position of the robot.
+        can_initially_stay (bool): Whether the robot can stay in its initial position.
+        travel_distance (int): Maximum distance the robot can travel from its initial position.
+        draws (numpy.ndarray): The draws of the right, left, up and down moves and of staying, a boolean row per
+            visited cell, holding at least as many rows as cells within the travel distance.
 
     Returns:
-        int: A random integer within the specified range.
+        Robot: The robot.
     """
-    return rand.randint(min_num, max_num)
+    robot = Robot()
+    robot.initial_pos = initial_pos
+    stack = [initial_pos]
+    visited = 0
+    while stack:
+        current_pos = stack.pop()
+        if robot.movement_get(current_pos[0], current_pos[1]) is not None:
+            continue
+        draw = draws[visited].tolist()
+        visited += 1
+        cur_distance = distance(current_pos[0], current_pos[1], initial_pos[0], initial_pos[1])
+        moves = []
+        for (dr, dc), happened in zip(DIRECTIONS, draw):
+            row, col = current_pos[0] + dr, current_pos[1] + dc
+            moves.append(happened and 0 <= row < n and 0 <= col < n and
+                         abs(cur_distance[0] if dr else cur_distance[1]) < travel_distance)
+        can_stay = can_initially_stay if current_pos == initial_pos else draw[4]
+        if not any(moves):
+            can_stay = True
+
+        robot.add_movement(current_pos[0], current_pos[1], *moves, can_stay, current_pos == initial_pos)
+        # Pushed in reverse so the right move is explored first
+        for (dr, dc), move in reversed(list(zip(DIRECTIONS, moves))):
+            if move:
+                stack.append((current_pos[0] + dr, current_pos[1] + dc))
+
+    return robot
 
 
 def distance(r, c, ri, ci):
@@ -248,51 +392,3 @@ def distance(r, c, ri, ci):
         tuple: A tuple representing the distance between the two points along the rows and columns.
     """
     return (ri - r), (ci - c)
-
-
-def step(current_pos, n, robot, initial_pos, stay_chance, travel_distance):
-    """
-    Take a step in the robot's movement and update its properties accordingly.
-
-    Args:
-        current_pos (tuple): The current position of the robot.
-        n (int): Size of the grid.
-        robot (Robot): The robot object.
-        initial_pos (tuple): The initial position of the robot.
-        stay_chance (float): Probability of staying in the same position.
-        travel_distance (int): Maximum distance the robot can travel from its initial position.
-
-    Returns:
-        None
-    """
-    if robot.movement_get(current_pos[0], current_pos[1]) is not None:
-        return
-
-    cur_distance = distance(current_pos[0], current_pos[1], initial_pos[0], initial_pos[1])
-    can_move_up = has_happend(0.5) and ((current_pos[0] - 1) >= 0) and (abs(cur_distance[0]) < travel_distance)
-    can_move_down = has_happend(0.5) and ((current_pos[0] + 1) < n) and (abs(cur_distance[0]) < travel_distance)
-    can_move_right = has_happend(0.5) and ((current_pos[1] + 1) < n) and (abs(cur_distance[1]) < travel_distance)
-    can_move_left = has_happend(0.5) and ((current_pos[1] - 1) >= 0) and (abs(cur_distance[1]) < travel_distance)
-    can_stay = has_happend(stay_chance)
-
-    if (not can_move_up) and (not can_move_down) and (not can_move_left) and (not can_move_right):
-        can_stay = True
-
-    robot.add_movement(current_pos[0], current_pos[1], can_move_right, can_move_left, can_move_up, can_move_down,
-                       can_stay, False)
-
-    if can_move_right:
-        step((current_pos[0], current_pos[1] + 1), n, robot, initial_pos, stay_chance,
-             travel_distance)
-
-    if can_move_left:
-        step((current_pos[0], current_pos[1] - 1), n, robot, initial_pos, stay_chance,
-             travel_distance)
-
-    if can_move_up:
-        step((current_pos[0] - 1, current_pos[1]), n, robot, initial_pos, stay_chance,
-             travel_distance)
-
-    if can_move_down:
-        step((current_pos[0] + 1, current_pos[1]), n, robot, initial_pos, stay_chance,
-             travel_distance)
@@ -0,0 +1,76 @@
+import json
+import logging
+
+LOGGER_NAME = "Services"
+TRACE_LOGGER_NAME = "Services.trace"
+FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# The services only log, the applications choose where to (see configure)
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+# Solution traces go to their own structured file only, and are off until configure(trace_path=...)
+trace_logger = logging.getLogger(TRACE_LOGGER_NAME)
+trace_logger.propagate = False
+trace_logger.setLevel(logging.WARNING)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats trace records as JSON lines: the time, the event (the message) and the fields of the trace.
+    """
+    def format(self, record):
+        """
+        Format a record.
+
+        Args:
+            record (logging.LogRecord): The record, its fields in the "trace" attribute.
+
+        Returns:
+            str: The JSON line.
+        """
+        entry = {"time": record.created, "event": record.getMessage()}
+        entry.update(getattr(record, "trace", {}))
+        return json.dumps(entry)
+
+
+def configure(level=logging.WARNING, trace_path=None, stream=None):
+    """
+    Configure the logging of the services. Calling it again replaces the previous configuration.
+
+    Args:
+        level (int or str): The level of the log, e.g. logging.DEBUG or "INFO".
+        trace_path (str): File to append the solution traces to as JSON lines, or None to disable the traces.
+        stream: The stream of the log, or None for stderr.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level)
+    for handler in logger.handlers + trace_logger.handlers:
+        if getattr(handler, "configured", False):
+            handler.close()
+            logging.getLogger(handler.configured).removeHandler(handler)
+
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    handler.configured = LOGGER_NAME
+    logger.addHandler(handler)
+
+    if trace_path is None:
+        trace_logger.setLevel(logging.WARNING)
+    else:
+        trace_handler = logging.FileHandler(trace_path, encoding="utf-8")
+        trace_handler.setFormatter(JsonLinesFormatter())
+        trace_handler.configured = TRACE_LOGGER_NAME
+        trace_logger.addHandler(trace_handler)
+        trace_logger.setLevel(logging.INFO)
+
+
+def trace(event, **fields):
+    """
+    Write a solution trace, if the traces are enabled.
+
+    Args:
+        event (str): The event, e.g. "witness".
+        **fields: The fields of the trace, serializable to JSON.
+    """
+    if trace_logger.isEnabledFor(logging.INFO):
+        trace_logger.info(event, extra={"trace": fields})
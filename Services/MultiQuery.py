@@ -0,0 +1,144 @@
+from z3 import Context, Solver, Bool, Implies, Or, sat, unsat, is_true
+
+from Services.BoundSearch import galloping_search, linear_search, GALLOPING, LINEAR
+from Services.Formulizer import create_base, occupancy_array, step_k, step_sp
+from Services.GraphSearch import shortest_paths
+from Services.Solver import check
+
+ENGINES = ("graph", "sat")
+
+
+class MultiQuerySolver:
+    """
+    Answers shortest path queries between any start and goal, starting at any time step, against a single
+    encoding of the system.
+
+    The grid is encoded once up to a horizon, without the start and the goal: every occupied cell is dropped,
+    every step is a valid move, at most one cell is taken per step, and the path may end at any step (through a
+    per step halt literal). A query only adds a selector literal implying its start, that the path ends at its
+    goal, and one literal per checked bound implying that the goal is reached by then. The queries are then
+    checked under their literals as assumptions, sharing the clauses the solver learns.
+    """
+    def __init__(self, n, M2, horizon, ctx=None):
+        """
+        Encode the system.
+
+        Args:
+            n (int): Size of the grid.
+            M2 (Kripke): The Kripke structure.
+            horizon (int): Number of time steps encoded, the start time of a query plus its path length must not
+                exceed it.
+            ctx (z3.Context): The context of the solver, or None for a new context of its own.
+        """
+        self.n = n
+        self.horizon = horizon
+        self.ctx = ctx if ctx is not None else Context()
+        self.solver = Solver(ctx=self.ctx)
+        self.base = create_base(n, horizon, ~occupancy_array(M2, n, horizon), self.ctx)
+        self.halts = [Bool(f'halt_{t}', self.ctx) for t in range(horizon)]
+        for t in range(horizon):
+            if t < horizon - 1:
+                self.solver.add(*step_k(self.base, n, t, halt=self.halts[t]))
+            self.solver.add(*step_sp(self.base, n, t))
+        self.num_queries = 0
+
+    def query(self, start, goal, start_time=0, max_k=None, strategy=GALLOPING):
+        """
+        Search for the shortest path of a query.
+
+        Args:
+            start (tuple): The (row, column) the agent starts from.
+            goal (tuple): The (row, column) the agent must reach.
+            start_time (int): The time step of the system the agent starts at.
+            max_k (int): The longest path length to check, or None for the rest of the horizon.
+            strategy (str): The bound search strategy, GALLOPING or LINEAR (see Services.BoundSearch).
+
+        Returns:
+            tuple: A tuple containing the status (sat, unsat or "timeout"), the solution and its length (the
+                minimal k), or the last length checked if unsatisfiable.
+        """
+        max_k = self.horizon - start_time if max_k is None else min(max_k, self.horizon - start_time)
+        min_k = abs(goal[0] - start[0]) + abs(goal[1] - start[1]) + 1
+        start_var = self.base[start_time][start[0]][start[1]] if 0 <= start_time < self.horizon else None
+        if start_var is None or max_k < min_k:
+            return unsat, [], max_k
+
+        q = self.num_queries
+        self.num_queries += 1
+        selector = Bool(f'query_{q}', self.ctx)
+        self.solver.add(Implies(selector, start_var))
+        # The path may only end at the goal
+        for t in range(start_time, self.horizon):
+            goal_var = self.base[t][goal[0]][goal[1]]
+            self.solver.add(Implies(selector, Implies(self.halts[t], goal_var if goal_var is not None else False)))
+
+        def oracle(k):
+            goal_vars = [self.base[t][goal[0]][goal[1]] for t in range(start_time, start_time + k)]
+            goal_vars = [var for var in goal_vars if var is not None]
+            if not goal_vars:
+                return unsat, []
+            reach = Bool(f'reach_{q}_{k}', self.ctx)
+            self.solver.add(Implies(reach, Or(goal_vars)))
+            status = check(self.solver, selector, reach)
+            if status != sat:
+                return status, []
+            return status, self.extract_path(self.solver.model(), start, goal, start_time, start_time + k)
+
+        search = linear_search if strategy == LINEAR else galloping_search
+        return search(oracle, min_k, max_k)
+
+    def extract_path(self, model, start, goal, start_time, end):
+        """
+        Extract the path of a query from a model, up to its first arrival at the goal.
+
+        Args:
+            model (z3.ModelRef): A model of the encoding under the query's assumptions.
+            start (tuple): The (row, column) the agent starts from.
+            goal (tuple): The (row, column) the agent must reach.
+            start_time (int): The time step of the system the agent starts at.
+            end (int): The time step the goal must be reached before.
+
+        Returns:
+            list: The (row, column) position of the agent at every time step from start_time.
+        """
+        solution = [start]
+        for t in range(start_time + 1, end):
+            row, col = solution[-1]
+            if (row, col) == goal:
+                break
+            for r, c in ((row, col), (row - 1, col), (row + 1, col), (row, col + 1), (row, col - 1)):
+                if 0 <= r < self.n and 0 <= c < self.n and self.base[t][r][c] is not None and \
+                        is_true(model.eval(self.base[t][r][c], True)):
+                    solution.append((r, c))
+                    break
+        return solution
+
+
+def solve_queries(n, M2, queries, max_k, engine="graph"):
+    """
+    Answer a batch of shortest path queries against one system.
+
+    The graph engine runs one breadth first search per distinct (start, start time) for all of its goals, the sat
+    engine encodes the system once in a MultiQuerySolver.
+
+    Args:
+        n (int): Size of the grid.
+        M2 (Kripke): The Kripke structure.
+        queries (list): The (start, goal, start_time) of every query, start and goal being (row, column) tuples.
+        max_k (int): The longest path length to check for every query.
+        engine (str): "graph" or "sat".
+
+    Returns:
+        list: The status, solution and path length of every query, in the order of the queries.
+    """
+    if engine == "graph":
+        groups = {}
+        for start, goal, start_time in queries:
+            groups.setdefault((start, start_time), set()).add(goal)
+        answers = {key: shortest_paths(n, M2, list(goals), max_k, key[0], key[1]) for key, goals in groups.items()}
+        return [answers[(start, start_time)][goal] for start, goal, start_time in queries]
+    if engine == "sat":
+        horizon = max((start_time for _, _, start_time in queries), default=0) + max_k
+        solver = MultiQuerySolver(n, M2, horizon)
+        return [solver.query(start, goal, start_time, max_k) for start, goal, start_time in queries]
+    raise ValueError(f"Unknown engine: {engine}")
@@ -0,0 +1,65 @@
+import numpy as np
+
+from Services.Formulizer import occupancy_array
+
+# State of a cell in a frame, a collision being an occupied cell holding the agent
+EMPTY = 0
+OCCUPIED = 1
+AGENT = 2
+COLLISION = OCCUPIED + AGENT
+
+
+class PlaybackFrames:
+    """
+    The frames of a solution's playback, rendered once: the state of every cell at every time step of the witness,
+    along with the occupied cells of every step.
+    """
+    def __init__(self, M2, n, solution):
+        """
+        Render the frames.
+
+        Args:
+            M2 (Kripke): The Kripke structure.
+            n (int): Size of the grid.
+            solution (list): The (row, column) position of the agent at every time step.
+        """
+        self.n = n
+        self.solution = np.asarray(solution, dtype=np.int64).reshape(-1, 2)
+        occupancy = occupancy_array(M2, n, len(self.solution))
+        self.frames = occupancy.astype(np.uint8)
+        self.frames[np.arange(len(self.solution)), self.solution[:, 0], self.solution[:, 1]] += AGENT
+        self.occupied = [np.flatnonzero(grid) for grid in occupancy]
+
+    def __len__(self):
+        """
+        Get the number of frames.
+
+        Returns:
+            int: The number of time steps of the solution.
+        """
+        return len(self.frames)
+
+    def frame(self, t):
+        """
+        Get the frame of a time step.
+
+        Args:
+            t (int): The time step.
+
+        Returns:
+            numpy.ndarray: An (n, n) array of cell states (EMPTY, OCCUPIED, AGENT or COLLISION).
+        """
+        return self.frames[t]
+
+    def changed_cells(self, previous, t):
+        """
+        Get the cells to repaint when going from a frame to another, for sequential playback as well as scrubbing.
+
+        Args:
+            previous (int): The time step shown.
+            t (int): The time step to show.
+
+        Returns:
+            numpy.ndarray: The (row * n + column) index of every cell whose state differs between the two frames.
+        """
+        return np.flatnonzero(self.frames[previous] != self.frames[t])
@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import queue
+import time
+
+from z3 import sat, unsat
+
+from Services.Solver import Solve
+
+STATUSES = {str(sat): sat, str(unsat): unsat}
+# Time given to the workers past the timeout (e.g. to start, or to leave a Z3 call) before giving up on them
+GRACE_SEC = 5.0
+# Interval of the checks for dead workers while waiting for a result
+POLL_SEC = 0.5
+
+
+def solve_bound(n, M2, k, config):
+    """
+    Solve a single bound in a worker process.
+
+    Args:
+        n (int): Size of the grid.
+        M2 (Kripke): The Kripke structure.
+        k (int): The length of the path.
+        config (dict): Keyword arguments of Solver.Solve (e.g. {"tactic": "sat", "seed": 3}).
+
+    Returns:
+        tuple: The bound, the status as a string and the solution.
+    """
+    status, solution = Solve(n, M2, k, **config)
+    return k, str(status), solution
+
+
+def solve_portfolio(n, M2, min_k, max_k, workers=None, configs=None, timeout_sec=None):
+    """
+    Check several bounds in parallel and return the shortest path.
+
+    The bounds are handed to a process pool in increasing order. The search stops as soon as a bound is proven
+    satisfiable and every smaller bound is proven unsatisfiable, and the remaining workers are terminated.
+
+    Args:
+        n (int): Size of the grid.
+        M2 (Kripke): The Kripke structure.
+        min_k (int): The first path length to check.
+        max_k (int): The last path length to check.
+        workers (int): Number of worker processes, or None for the number of CPUs.
+        configs (list): Solver configurations (keyword arguments of Solver.Solve, such as tactic and seed),
+            assigned to the bounds round-robin, or None for the default solver on every bound.
+        timeout_sec (float): Timeout of the whole search in seconds, or None for no timeout. The results are
+            awaited GRACE_SEC more before the search gives up.
+
+    Returns:
+        tuple: A tuple containing the status (sat, unsat or "timeout"), the solution and the path length it was
+            found at (the first bound that was not proven unsatisfiable).
+
+    Raises:
+        RuntimeError: If a worker process died (e.g. killed for lack of memory), its bound would never finish.
+    """
+    if max_k < min_k:
+        return unsat, [], max_k
+    configs = configs or [{}]
+    workers = min(workers or os.cpu_count() or 1, max_k - min_k + 1)
+    results = queue.Queue()
+    deadline = None if timeout_sec is None else time.monotonic() + timeout_sec
+
+    # Spawned workers do not inherit the Z3 context or the GUI threads of the parent
+    others = {process.pid for process in multiprocessing.active_children()}
+    pool = multiprocessing.get_context("spawn").Pool(workers)
+    pids = {process.pid for process in multiprocessing.active_children()} - others
+    try:
+        for i, k in enumerate(range(min_k, max_k + 1)):
+            config = configs[i % len(configs)]
+            if timeout_sec is not None:
+                config = {"timeout_sec": timeout_sec, **config}
+            pool.apply_async(solve_bound, (n, M2, k, config), callback=results.put, error_callback=results.put)
+
+        done = {}
+        k = min_k
+        while k <= max_k:
+            if k not in done:
+                if deadline is not None and time.monotonic() > deadline + GRACE_SEC:
+                    return "timeout", [], k
+                try:
+                    res = results.get(timeout=POLL_SEC)
+                except queue.Empty:
+                    # The pool replaces a dead worker, but the bound it was solving is lost
+                    if not pids <= {process.pid for process in multiprocessing.active_children()}:
+                        raise RuntimeError("A portfolio worker process died")
+                    continue
+                if isinstance(res, BaseException):
+                    raise res
+                done[res[0]] = STATUSES.get(res[1], res[1]), res[2]
+                continue
+            status, solution = done[k]
+            if status != unsat:
+                return status, solution, k
+            k += 1
+        return unsat, [], max_k
+    finally:
+        pool.terminate()
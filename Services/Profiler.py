@@ -0,0 +1,163 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class Profiler:
+    """
+    Records the wall and CPU time of the phases of building and solving the formulas, the number of constraints
+    every phase produced and the Z3 statistics of every check.
+    """
+    def __init__(self):
+        """
+        Initialize an empty profile.
+        """
+        self.phases = {}
+        self.checks = []
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a phase. Nested phases are timed separately, each including the time of the phases it contains.
+
+        Args:
+            name (str): The name of the phase, e.g. "alpha_k" or "check".
+        """
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.entry(name)
+            entry["calls"] += 1
+            entry["wall_sec"] += time.perf_counter() - wall
+            entry["cpu_sec"] += time.process_time() - cpu
+
+    def count(self, name, constraints):
+        """
+        Add to the number of constraints a phase produced.
+
+        Args:
+            name (str): The name of the phase.
+            constraints (int): The number of constraints (Z3 terms or CNF clauses).
+        """
+        self.entry(name)["constraints"] += constraints
+
+    def entry(self, name):
+        """
+        Get the totals of a phase, creating them on first use.
+
+        Args:
+            name (str): The name of the phase.
+
+        Returns:
+            dict: The calls, wall_sec, cpu_sec and constraints of the phase.
+        """
+        if name not in self.phases:
+            self.phases[name] = {"calls": 0, "wall_sec": 0.0, "cpu_sec": 0.0, "constraints": 0}
+        return self.phases[name]
+
+    def record_statistics(self, k, status, statistics):
+        """
+        Record the statistics of a check.
+
+        Args:
+            k (int): The bound checked.
+            status: The status of the check.
+            statistics (dict): The Z3 statistics of the check (see Services.Solver.statistics).
+        """
+        self.checks.append({"k": k, "status": str(status), "statistics": statistics})
+
+    def on_event(self, event):
+        """
+        Record the statistics of the checks from the progress events of the solver (see Services.Solver.emit).
+
+        Args:
+            event (dict): The event.
+        """
+        if event["event"] == "check_finished":
+            self.record_statistics(event["k"], event["status"], event["statistics"])
+
+    def statistics_totals(self):
+        """
+        Sum the numeric statistics of all the checks.
+
+        Returns:
+            dict: The total of every statistic, "memory" and "max memory" being maxima instead.
+        """
+        totals = {}
+        for check in self.checks:
+            for key, value in check["statistics"].items():
+                if isinstance(value, (int, float)):
+                    if "memory" in key:
+                        totals[key] = max(totals.get(key, 0), value)
+                    else:
+                        totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def report(self):
+        """
+        Format the profile as a text report.
+
+        Returns:
+            str: A table of the phases followed by the statistics of the checks.
+        """
+        lines = [f"{'phase':<16} {'calls':>7} {'wall (s)':>10} {'cpu (s)':>10} {'constraints':>12}"]
+        for name, entry in self.phases.items():
+            lines.append(f"{name:<16} {entry['calls']:>7} {entry['wall_sec']:>10.4f} {entry['cpu_sec']:>10.4f} "
+                         f"{entry['constraints']:>12}")
+        lines.append("")
+        lines.append(f"checks: {len(self.checks)}")
+        for key, value in sorted(self.statistics_totals().items()):
+            lines.append(f"  {key:<30} {value}")
+        return "\n".join(lines)
+
+    def prometheus(self, prefix="bmc"):
+        """
+        Format the profile in the Prometheus text exposition format.
+
+        Args:
+            prefix (str): The prefix of the metric names.
+
+        Returns:
+            str: The metrics.
+        """
+        lines = []
+        for metric, key, kind in (("phase_calls_total", "calls", "counter"),
+                                  ("phase_wall_seconds_total", "wall_sec", "counter"),
+                                  ("phase_cpu_seconds_total", "cpu_sec", "counter"),
+                                  ("phase_constraints_total", "constraints", "counter")):
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, entry in self.phases.items():
+                lines.append(f'{prefix}_{metric}{{phase="{name}"}} {entry[key]}')
+        lines.append(f"# TYPE {prefix}_checks_total counter")
+        lines.append(f"{prefix}_checks_total {len(self.checks)}")
+        lines.append(f"# TYPE {prefix}_solver_statistic gauge")
+        for key, value in sorted(self.statistics_totals().items()):
+            lines.append(f'{prefix}_solver_statistic{{name="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def phase(profiler, name):
+    """
+    Time a phase with an optional profiler.
+
+    Args:
+        profiler (Profiler): The profiler, or None.
+        name (str): The name of the phase.
+
+    Returns:
+        A context manager timing the phase, doing nothing without a profiler.
+    """
+    return profiler.phase(name) if profiler is not None else nullcontext()
+
+
+def count(profiler, name, constraints):
+    """
+    Add to the number of constraints of a phase with an optional profiler.
+
+    Args:
+        profiler (Profiler): The profiler, or None.
+        name (str): The name of the phase.
+        constraints (int): The number of constraints.
+    """
+    if profiler is not None:
+        profiler.count(name, constraints)
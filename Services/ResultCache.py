@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+from z3 import sat, unsat
+
+STATUSES = {str(sat): sat, str(unsat): unsat}
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".bmc_path_planning", "cache")
+
+_default_cache = None
+
+
+def occupancy_lasso(M2):
+    """
+    Get the canonical lasso of occupancies of a system: the shortest prefix and cycle producing the same
+    occupancy at every time step, so equivalent systems get the same lasso whatever their states.
+
+    Args:
+        M2 (Kripke): The Kripke structure.
+
+    Returns:
+        tuple: The occupancy bitmasks of the prefix followed by the cycle, and the index of the cycle's start.
+    """
+    phases = {}
+    occupancies = []
+    t = 0
+    while M2.phase_at(t) not in phases:
+        phases[M2.phase_at(t)] = t
+        occupancies.append(M2.occupancy_at(t))
+        t += 1
+    loop_start = phases[M2.phase_at(t)]
+    prefix, cycle = occupancies[:loop_start], occupancies[loop_start:]
+
+    # Shortest period of the cycle
+    for period in range(1, len(cycle) + 1):
+        if len(cycle) % period == 0 and all(cycle[i] == cycle[i % period] for i in range(len(cycle))):
+            cycle = cycle[:period]
+            break
+
+    # Move the start of the cycle back over the prefix while it repeats it
+    while prefix and prefix[-1] == cycle[-1]:
+        prefix.pop()
+        cycle = [cycle[-1]] + cycle[:-1]
+    return tuple(prefix + cycle), len(prefix)
+
+
+def fingerprint(M2, n):
+    """
+    Get the fingerprint of a system, computed once per grid size and kept by the system until it changes.
+
+    Args:
+        M2 (Kripke): The Kripke structure.
+        n (int): Size of the grid.
+
+    Returns:
+        str: The SHA-256 hex digest of the grid size and the canonical occupancy lasso.
+    """
+    fingerprints = getattr(M2, "_fingerprints", None)
+    if fingerprints is not None and n in fingerprints:
+        return fingerprints[n]
+    occupancies, loop_start = occupancy_lasso(M2)
+    digest = hashlib.sha256(f"{n}:{loop_start}:".encode())
+    digest.update(",".join(format(occupancy, "x") for occupancy in occupancies).encode())
+    if fingerprints is not None:
+        fingerprints[n] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Cache of solver results keyed by system fingerprint and path length, held in memory with LRU eviction and
+    optionally mirrored on disk (one JSON file per entry, and a DIMACS file if the CNF was stored).
+    """
+    def __init__(self, max_entries=256, directory=None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of entries kept in memory.
+            directory (str): Directory of the disk cache, or None to keep the entries in memory only.
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.entries = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, M2, n, k):
+        """
+        Get the key of an entry.
+
+        Args:
+            M2 (Kripke): The Kripke structure.
+            n (int): Size of the grid.
+            k (int): The length of the path.
+
+        Returns:
+            str: The key of the entry.
+        """
+        return f"{fingerprint(M2, n)}-{k}"
+
+    def get(self, M2, n, k):
+        """
+        Get a cached result.
+
+        Args:
+            M2 (Kripke): The Kripke structure.
+            n (int): Size of the grid.
+            k (int): The length of the path.
+
+        Returns:
+            tuple: The status and the solution, or None if the result is not cached.
+        """
+        key = self.key(M2, n, k)
+        entry = self.entries.get(key)
+        if entry is None and self.directory is not None:
+            try:
+                with open(os.path.join(self.directory, f"{key}.json"), encoding="utf-8") as entry_file:
+                    entry = json.load(entry_file)
+            except (OSError, ValueError):
+                return None
+        if entry is None or entry["status"] not in STATUSES:
+            return None
+        self.remember(key, entry)
+        return STATUSES[entry["status"]], [tuple(position) for position in entry["solution"]]
+
+    def put(self, M2, n, k, status, solution, cnf=None):
+        """
+        Store a result. Only proven results (sat or unsat) are stored.
+
+        Args:
+            M2 (Kripke): The Kripke structure.
+            n (int): Size of the grid.
+            k (int): The length of the path.
+            status: The status of the solution.
+            solution (list): The (row, column) position of the agent at every time step.
+            cnf (CNF): The CNF encoding of the bound to store on disk as well, or None.
+        """
+        if str(status) not in STATUSES:
+            return
+        key = self.key(M2, n, k)
+        entry = {"n": n, "k": k, "status": str(status), "solution": [list(position) for position in solution]}
+        self.remember(key, entry)
+        if self.directory is not None:
+            self.write(f"{key}.json", json.dumps(entry))
+            if cnf is not None:
+                self.write(f"{key}.cnf", cnf.to_dimacs())
+
+    def get_cnf(self, M2, n, k):
+        """
+        Get the stored CNF encoding of a bound.
+
+        Args:
+            M2 (Kripke): The Kripke structure.
+            n (int): Size of the grid.
+            k (int): The length of the path.
+
+        Returns:
+            str: The formula in DIMACS format, or None if it is not stored.
+        """
+        if self.directory is None:
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{self.key(M2, n, k)}.cnf"), encoding="utf-8") as cnf_file:
+                return cnf_file.read()
+        except OSError:
+            return None
+
+    def remember(self, key, entry):
+        """
+        Keep an entry in memory as the most recently used, evicting the least recently used one if full.
+
+        Args:
+            key (str): The key of the entry.
+            entry (dict): The entry.
+        """
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def write(self, name, text):
+        """
+        Write a file of the disk cache atomically, so concurrent readers never see a partial entry.
+
+        Args:
+            name (str): The name of the file in the cache directory.
+            text (str): The content of the file.
+        """
+        fd, path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+            tmp_file.write(text)
+        os.replace(path, os.path.join(self.directory, name))
+
+
+def default_cache():
+    """
+    Get the cache shared by the GUI, stored in the user's home directory.
+
+    Returns:
+        ResultCache: The shared cache, created on the first call.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache(directory=DEFAULT_DIRECTORY)
+    return _default_cache
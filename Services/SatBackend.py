@@ -0,0 +1,134 @@
+import os
+import subprocess
+import tempfile
+
+from z3 import SolverFor, sat, unsat, unknown, is_true, Z3Exception
+
+
+class SatBackend:
+    """
+    Interface of a SAT solver running CNF formulas produced by Services.CNFEncoder.
+    """
+    def solve(self, cnf):
+        """
+        Check the satisfiability of a CNF formula.
+
+        Args:
+            cnf (CNF): The formula.
+
+        Returns:
+            tuple: The status (sat, unsat or "timeout") and the set of variables assigned True.
+        """
+        raise NotImplementedError()
+
+
+class Z3SatBackend(SatBackend):
+    """
+    Runs CNF formulas on the SAT core of Z3, parsing the DIMACS text natively.
+    """
+    def __init__(self, timeout_ms=None):
+        """
+        Initialize the backend.
+
+        Args:
+            timeout_ms (int): Timeout of every check in milliseconds, or None for no timeout.
+        """
+        self.timeout_ms = timeout_ms
+
+    def solve(self, cnf):
+        """
+        Check the satisfiability of a CNF formula with Z3.
+
+        Args:
+            cnf (CNF): The formula.
+
+        Returns:
+            tuple: The status (sat, unsat or "timeout") and the set of variables assigned True.
+        """
+        solver = SolverFor("QF_FD")
+        if self.timeout_ms is not None:
+            solver.set("timeout", self.timeout_ms)
+        solver.from_string(cnf.to_dimacs())
+        try:
+            status = solver.check()
+        except Z3Exception:
+            return "timeout", set()
+
+        if status == unknown:
+            return "timeout", set()
+        if status != sat:
+            return status, set()
+
+        # DIMACS variables are declared by Z3 as k!<index>
+        model = solver.model()
+        true_vars = set()
+        for decl in model.decls():
+            if is_true(model[decl]):
+                true_vars.add(int(decl.name().split('!')[1]))
+        return sat, true_vars
+
+
+class DimacsBinaryBackend(SatBackend):
+    """
+    Runs CNF formulas on an external SAT solver binary following the SAT competition conventions
+    (DIMACS input file, "s SATISFIABLE" / "s UNSATISFIABLE" status line and "v" model lines).
+    """
+    def __init__(self, command, args=(), timeout_sec=None):
+        """
+        Initialize the backend.
+
+        Args:
+            command (str): The solver binary, e.g. "kissat" or "/usr/local/bin/cadical".
+            args (tuple): Extra command line arguments placed before the input file.
+            timeout_sec (float): Timeout of every run in seconds, or None for no timeout.
+        """
+        self.command = command
+        self.args = tuple(args)
+        self.timeout_sec = timeout_sec
+
+    def solve(self, cnf):
+        """
+        Check the satisfiability of a CNF formula with the solver binary.
+
+        Args:
+            cnf (CNF): The formula.
+
+        Returns:
+            tuple: The status (sat, unsat or "timeout") and the set of variables assigned True.
+        """
+        fd, path = tempfile.mkstemp(suffix=".cnf")
+        try:
+            with os.fdopen(fd, "w") as cnf_file:
+                cnf_file.write(cnf.to_dimacs())
+            try:
+                output = subprocess.run([self.command, *self.args, path], capture_output=True, text=True,
+                                        timeout=self.timeout_sec).stdout
+            except subprocess.TimeoutExpired:
+                return "timeout", set()
+        finally:
+            os.remove(path)
+
+        return parse_solver_output(output)
+
+
+def parse_solver_output(output):
+    """
+    Parse the output of a SAT competition style solver.
+
+    Args:
+        output (str): The standard output of the solver.
+
+    Returns:
+        tuple: The status (sat, unsat or "timeout") and the set of variables assigned True.
+    """
+    status = "timeout"
+    true_vars = set()
+    for line in output.splitlines():
+        if line.startswith("s "):
+            if line.strip() == "s SATISFIABLE":
+                status = sat
+            elif line.strip() == "s UNSATISFIABLE":
+                status = unsat
+        elif line.startswith("v "):
+            true_vars.update(lit for lit in map(int, line[2:].split()) if lit > 0)
+    return status, true_vars
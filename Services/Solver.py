@@ -1,13 +1,131 @@
-from threading import Thread
+import logging
+import time
+from threading import Thread, Event
 
-from z3 import Solver, sat, is_true, unsat, Z3Exception
+from z3 import Context, Solver, Tactic, Bool, Implies, sat, is_true, unsat, unknown, Z3Exception
 
-from Services.Formulizer import formulise
+from Services.CNFEncoder import encode, decode
+from Services.Formulizer import formulise, count_variables, create_step, step_mask, alpha_initial, alpha_final, \
+    step_k, step_s, step_sp
+from Services.Interruption import Interruption, Interrupted, checkpoint
+from Services.Logging import trace
+from Services.Profiler import phase, count
 
-ret = None
+logger = logging.getLogger(__name__)
 
+# Progress events, sent to the on_event callback as dicts {"event": kind, "k": bound, "time": epoch seconds, ...}
+BOUND_STARTED = "bound_started"
+FORMULA_BUILT = "formula_built"  # "variables" and "clauses" (cumulative for the incremental solver)
+CHECK_FINISHED = "check_finished"  # "status", "duration_sec" and the Z3 "statistics" of the check
+WITNESS_FOUND = "witness_found"  # "solution"
+JOB_FINISHED = "job_finished"  # "status" of the SolverJob, sent once its result is available
 
-def Solve(n, M2, length):
+
+def emit(on_event, kind, k, **fields):
+    """
+    Send a progress event to a subscriber.
+
+    The callback runs on the solving thread, so it should only hand the event over (e.g. emit a Qt signal or put it
+    in a queue).
+
+    Args:
+        on_event (callable): The subscriber, taking the event dict, or None.
+        kind (str): The kind of the event (BOUND_STARTED, FORMULA_BUILT, CHECK_FINISHED, WITNESS_FOUND or
+            JOB_FINISHED).
+        k (int): The bound the event is about.
+        **fields: The fields of the event.
+    """
+    if on_event is not None:
+        on_event({"event": kind, "k": k, "time": time.time(), **fields})
+
+
+def report_check(solver, k, status, duration_sec, on_event=None, profiler=None):
+    """
+    Report a finished check to the progress subscriber and the profiler. The statistics of the solver are only
+    collected if one of them is given.
+
+    Args:
+        solver (z3.Solver): The solver, or None for checks outside Z3.
+        k (int): The bound checked.
+        status: The status of the check.
+        duration_sec (float): The duration of the check in seconds.
+        on_event (callable): Subscriber of the progress events (see emit), or None.
+        profiler (Profiler): The profiler, or None.
+    """
+    if on_event is None and profiler is None:
+        return
+    stats = statistics(solver) if solver is not None else {}
+    if profiler is not None:
+        profiler.record_statistics(k, status, stats)
+    emit(on_event, CHECK_FINISHED, k, status=str(status), duration_sec=duration_sec, statistics=stats)
+
+
+def statistics(solver):
+    """
+    Get the statistics of the last check of a solver.
+
+    Args:
+        solver (z3.Solver): The solver.
+
+    Returns:
+        dict: The statistics, such as "conflicts", "decisions" or "memory".
+    """
+    stats = solver.statistics()
+    return {key: stats.get_key_value(key) for key in stats.keys()}
+
+
+def make_solver(tactic=None, seed=None, ctx=None):
+    """
+    Create a Z3 solver.
+
+    Args:
+        tactic (str): Name of a Z3 tactic to build the solver from (e.g. "sat", "qffd"), or None for the default solver.
+        seed (int): Random seed of the solver, or None for the default seed.
+        ctx (z3.Context): The context of the solver, or None for the global context.
+
+    Returns:
+        z3.Solver: The solver.
+    """
+    solver = Solver(ctx=ctx) if tactic is None else Tactic(tactic, ctx).solver()
+    if seed is not None:
+        solver.set("random_seed", seed)
+    return solver
+
+
+def check(solver, *assumptions, timeout_sec=None, stop_event=None):
+    """
+    Check the satisfiability of a solver, honouring a timeout and a cancellation request.
+
+    Args:
+        solver (z3.Solver): The solver.
+        *assumptions: Assumptions of the check.
+        timeout_sec (float): Timeout of the check in seconds, or None for no timeout. If it is not positive the
+            check is skipped.
+        stop_event (threading.Event): If set before the check starts, the check is skipped.
+
+    Returns:
+        The status of the check: sat, unsat, "timeout" or "cancelled".
+    """
+    if stop_event is not None and stop_event.is_set():
+        return "cancelled"
+    if timeout_sec is not None and timeout_sec <= 0:
+        return "timeout"
+    if timeout_sec is not None:
+        solver.set("timeout", max(1, int(timeout_sec * 1000)))
+    try:
+        status = solver.check(*assumptions)
+    except Z3Exception:
+        status = unknown
+
+    if status == unknown:
+        if stop_event is not None and stop_event.is_set():
+            return "cancelled"
+        return "timeout"
+    return status
+
+
+def Solve(n, M2, length, backend=None, tactic=None, seed=None, ctx=None, timeout_sec=None, stop_event=None,
+          within=False, on_event=None, profiler=None, deadline=None):
     """
     Solve the given formula using Z3 solver.
 
@@ -15,80 +133,433 @@ def Solve(n, M2, length):
         n (int): Size of the grid.
         M2 (Kripke): The Kripke structure.
         length (int): The length of the path.
+        backend (SatBackend): Solve a CNF encoding of the formula with this SAT backend instead of
+            the Z3 term API, or None.
+        tactic (str): Name of the Z3 tactic to build the solver from, or None for the default solver.
+        seed (int): Random seed of the solver, or None for the default seed.
+        ctx (z3.Context): The context to build the formula in, or None for the global context.
+        timeout_sec (float): Timeout of the whole call (building the formula and checking it) in seconds, or None
+            for no timeout.
+        stop_event (threading.Event): Cancellation request, checked while the formula is built and before the
+            check starts.
+        within (bool): Look for a path reaching the goal within the given length, the solution then ends on
+            its first arrival at the goal.
+        on_event (callable): Subscriber of the progress events (see emit), or None.
+        profiler (Profiler): Profiler of the phases and checks (see Services.Profiler), or None.
+        deadline (float): time.monotonic() time to give up by, or None. The earliest of it and timeout_sec applies.
 
     Returns:
-        tuple: A tuple containing the status of the solution and the solution itself.
+        tuple: A tuple containing the status of the solution ("timeout" or "cancelled" if interrupted) and the
+            solution itself.
     """
+    if backend is not None:
+        return solve_cnf(n, M2, length, backend, on_event, profiler)
+
     solution = []
-    solver = Solver()
-    solver.add(formulise(M2, n, length))
-    print(f"running with k={length}")
+    interruption = Interruption.start(timeout_sec, stop_event, deadline)
+    emit(on_event, BOUND_STARTED, length)
+    solver = make_solver(tactic, seed, ctx)
     try:
-        # Check satisfiability with a timeout
-        status = solver.check()
-        if status == sat:
-            model = solver.model()
-            print("Satisfiable")
-
-            # Get declarations and sort them based on _t_
-            declarations = sorted(model, key=lambda x: int(x.name().split('_')[1]))
-
-            # Iterate through sorted declarations and print true assignments
-            for decl in declarations:
-                assignment = model[decl]
-                if is_true(assignment):
-                    solution.append((parse_string_to_tuple(str(decl))))
-                    print(f"{decl}: {assignment}")
-        else:
-            print("Not satisfiable")
+        clauses = formulise(M2, n, length, ctx=ctx, within=within, profiler=profiler, interruption=interruption)
+        with phase(profiler, "solver_add"):
+            solver.add(*clauses)
+    except Interrupted as interrupted:
+        logger.info("k=%d: %s while building the formula", length, interrupted.status)
+        return interrupted.status, solution
+    if on_event is not None:
+        emit(on_event, FORMULA_BUILT, length, variables=count_variables(M2, n, length), clauses=len(clauses))
+    logger.debug("running with k=%d", length)
+    # Check satisfiability with a timeout
+    start = time.perf_counter()
+    with phase(profiler, "check"):
+        status = check(solver, timeout_sec=interruption.remaining(), stop_event=stop_event)
+    report_check(solver, length, status, time.perf_counter() - start, on_event, profiler)
+    if status == sat:
+        model = solver.model()
+
+        # Get declarations and sort them based on _t_
+        declarations = sorted(model, key=lambda x: int(x.name().split('_')[1]))
 
-    except Z3Exception as e:
-        # Handle the timeout exception
-        print(f"Solving timeout")
-        status = "timeout"
+        # Iterate through sorted declarations and collect the true assignments
+        for decl in declarations:
+            if is_true(model[decl]):
+                solution.append((parse_string_to_tuple(str(decl))))
 
-    print("Sol test:")
-    print(solution)
+        if within and (n - 1, n - 1) in solution:
+            # The steps after the arrival are unconstrained
+            solution = solution[:solution.index((n - 1, n - 1)) + 1]
+        emit(on_event, WITNESS_FOUND, length, solution=solution)
+        trace("witness", n=n, k=length, solution=solution)
+    logger.info("k=%d: %s", length, status)
+    logger.debug("solution: %s", solution)
     return status, solution
 
 
-def run_solver_on_thread(n, M2, k):
+class IncrementalSolver:
     """
-        Run the solver on a separate thread with a specified timeout.
+    Bounded model checker that keeps a single Z3 solver alive across bounds.
+
+    Every time step is encoded once: growing the bound only adds the transition, safety and single path
+    constraints of the new steps, and the goal of each bound is checked as an assumption, so the clauses
+    learned while refuting smaller bounds are kept.
+    """
+    def __init__(self, n, M2, prune=True, ctx=None, within=False, on_event=None, profiler=None):
+        """
+        Initialize the incremental solver.
 
         Args:
             n (int): Size of the grid.
             M2 (Kripke): The Kripke structure.
-            k (int): Length of the path.
+            prune (bool): Only create variables for the cells reachable from the start that are not occupied.
+                The distance to the goal depends on the bound, so it is not used for pruning here.
+            ctx (z3.Context): The context of the solver, or None for a new context of its own, so its checks can
+                be interrupted.
+            within (bool): Look for paths reaching the goal within the bound instead of exactly at its last step.
+                The path ends on reaching the goal, so the bounds can be checked in any order.
+            on_event (callable): Subscriber of the progress events (see emit), or None.
+            profiler (Profiler): Profiler of the phases and checks (see Services.Profiler), or None.
+        """
+        self.n = n
+        self.M2 = M2
+        self.prune = prune
+        self.ctx = ctx if ctx is not None else Context()
+        self.solver = Solver(ctx=self.ctx)
+        self.base = []
+        self.current = None
+        self.interrupted = False
+        self.num_variables = 0
+        self.num_constraints = 0
+        self.within = within
+        self.reach = {}
+        self.on_event = on_event
+        self.profiler = profiler
+
+    def interrupt(self):
+        """
+        Interrupt the running check. Z3 does not guarantee a consistent state after an interrupt, so the solver
+        refuses any further bound afterwards.
+        """
+        self.interrupted = True
+        self.ctx.interrupt()
+
+    def extend(self, k, interruption=None):
+        """
+        Encode the time steps up to the given bound. An interruption stops it between two time steps, so the
+        steps encoded so far stay consistent and the next call carries on from there.
+
+        Args:
+            k (int): Number of time steps.
+            interruption (Interruption): Checked before every time step, or None.
+
+        Raises:
+            Interrupted: If the interruption requires to stop.
+        """
+        while len(self.base) < k:
+            checkpoint(interruption)
+            t = len(self.base)
+            self.current = self.M2.state_at(t)
+            with phase(self.profiler, "create_step"):
+                self.base.append(create_step(self.n, t, step_mask(self.current, self.n, t) if self.prune else None,
+                                             self.ctx))
+            with phase(self.profiler, "step_k"):
+                if t == 0:
+                    constraints = [alpha_initial(self.base)]
+                else:
+                    constraints = step_k(self.base, self.n, t - 1, self.within)
+            count(self.profiler, "step_k", len(constraints))
+            if not self.prune:
+                with phase(self.profiler, "step_s"):
+                    safety = step_s(self.base, self.current, self.n, t)
+                count(self.profiler, "step_s", len(safety))
+                constraints += safety
+            with phase(self.profiler, "step_sp"):
+                single_path = step_sp(self.base, self.n, t)
+            count(self.profiler, "step_sp", len(single_path))
+            constraints += single_path
+            with phase(self.profiler, "solver_add"):
+                self.solver.add(*constraints)
+            self.num_variables += sum(var is not None for row in self.base[t] for var in row)
+            self.num_constraints += len(constraints)
+
+    def solve(self, length, timeout_sec=None, stop_event=None, deadline=None):
+        """
+        Solve the system for a path of the given length.
+
+        Args:
+            length (int): The length of the path.
+            timeout_sec (float): Timeout of the whole call (encoding the new steps and checking) in seconds, or
+                None for no timeout.
+            stop_event (threading.Event): Cancellation request, checked while the steps are encoded and before the
+                check starts.
+            deadline (float): time.monotonic() time to give up by, or None. The earliest of it and timeout_sec
+                applies.
 
         Returns:
-            Thread: The thread running the solver.
+            tuple: A tuple containing the status of the solution ("timeout" or "cancelled" if interrupted) and the
+                solution itself.
+        """
+        solution = []
+        if self.interrupted:
+            return "cancelled", solution
+        if length < (2 * self.n) - 1:
+            return unsat, solution
+
+        interruption = Interruption.start(timeout_sec, stop_event, deadline)
+        emit(self.on_event, BOUND_STARTED, length)
+        try:
+            self.extend(length, interruption)
+        except Interrupted as interrupted:
+            logger.info("k=%d (incremental): %s while encoding", length, interrupted.status)
+            return interrupted.status, solution
+        emit(self.on_event, FORMULA_BUILT, length, variables=self.num_variables, clauses=self.num_constraints)
+        logger.debug("running with k=%d (incremental)", length)
+        start = time.perf_counter()
+        with phase(self.profiler, "check"):
+            status = check(self.solver, self.goal(length), timeout_sec=interruption.remaining(),
+                           stop_event=stop_event)
+        report_check(self.solver, length, status, time.perf_counter() - start, self.on_event, self.profiler)
+        if status == sat:
+            solution = self.extract_path(self.solver.model(), length)
+            emit(self.on_event, WITNESS_FOUND, length, solution=solution)
+            trace("witness", n=self.n, k=length, solution=solution)
+        logger.info("k=%d (incremental): %s", length, status)
+        logger.debug("solution: %s", solution)
+        return status, solution
+
+    def goal(self, length):
         """
-    global ret
-    ret = "running", []
-    if k < (2 * n) - 1:
-        return unsat, []
+        Get the assumption of the goal of a bound.
 
-    def target():
-        global ret
-        res = Solve(n, M2, k)
-        ret = res
+        Args:
+            length (int): The length of the path.
 
-    thread = Thread(target=target)
-    thread.start()
+        Returns:
+            z3.BoolRef: The goal variable, or in within mode a literal implying the goal is reached by then.
+        """
+        if not self.within:
+            return alpha_final(self.base, self.n, length)
+        if length not in self.reach:
+            self.reach[length] = Bool(f'reach_{length}', self.ctx)
+            self.solver.add(Implies(self.reach[length], alpha_final(self.base, self.n, length, True)))
+        return self.reach[length]
 
-    return thread
+    def extract_path(self, model, length):
+        """
+        Extract the agent's path from a model.
 
+        Args:
+            model (z3.ModelRef): A model of the encoded steps.
+            length (int): The length of the path.
 
-def get_result():
+        Returns:
+            list: The (row, column) position of the agent at every time step.
+        """
+        solution = [(0, 0)]
+        for t in range(1, length):
+            row, col = solution[-1]
+            if self.within and (row, col) == (self.n - 1, self.n - 1):
+                break
+            for r, c in ((row, col), (row - 1, col), (row + 1, col), (row, col + 1), (row, col - 1)):
+                if 0 <= r < self.n and 0 <= c < self.n and self.base[t][r][c] is not None and \
+                        is_true(model.eval(self.base[t][r][c], True)):
+                    solution.append((r, c))
+                    break
+        return solution
+
+
+def solve_incremental(n, M2, min_k, max_k):
     """
-    Get the result of the solver.
+    Search for the shortest path between the given bounds with a single incremental solver.
+
+    Args:
+        n (int): Size of the grid.
+        M2 (Kripke): The Kripke structure.
+        min_k (int): The first path length to check.
+        max_k (int): The last path length to check.
+
+    Returns:
+        tuple: A tuple containing the status, the solution and the last path length checked.
+    """
+    bmc = IncrementalSolver(n, M2)
+    status, solution = unsat, []
+    k = min_k
+    while k <= max_k:
+        status, solution = bmc.solve(k)
+        if status != unsat:
+            break
+        k += 1
+    return status, solution, min(k, max_k)
+
+
+def solve_cnf(n, M2, length, backend, on_event=None, profiler=None):
+    """
+    Solve the CNF encoding of the formula with a SAT backend.
+
+    Args:
+        n (int): Size of the grid.
+        M2 (Kripke): The Kripke structure.
+        length (int): The length of the path.
+        backend (SatBackend): The SAT backend.
+        on_event (callable): Subscriber of the progress events (see emit), or None.
+        profiler (Profiler): Profiler of the phases and checks (see Services.Profiler), or None.
 
     Returns:
         tuple: A tuple containing the status of the solution and the solution itself.
     """
-    global ret
-    return ret
+    logger.debug("running with k=%d (CNF)", length)
+    emit(on_event, BOUND_STARTED, length)
+    with phase(profiler, "encode"):
+        cnf, var_map = encode(M2, n, length)
+    count(profiler, "encode", cnf.num_clauses)
+    emit(on_event, FORMULA_BUILT, length, variables=cnf.num_vars, clauses=cnf.num_clauses)
+    start = time.perf_counter()
+    with phase(profiler, "check"):
+        status, true_vars = backend.solve(cnf)
+    report_check(None, length, status, time.perf_counter() - start, on_event, profiler)
+    solution = decode(var_map, true_vars) if status == sat else []
+    if status == sat:
+        emit(on_event, WITNESS_FOUND, length, solution=solution)
+        trace("witness", n=n, k=length, solution=solution)
+    logger.info("k=%d (CNF): %s", length, status)
+    return status, solution
+
+
+class SolverJob:
+    """
+    A solver run on a separate thread, holding its own result, that can be cancelled.
+
+    Attributes:
+        status (str): "running", "done", "timeout" or "cancelled".
+        result (tuple): The status of the solution and the solution itself, None while running.
+    """
+    def __init__(self, n, M2, k, bmc=None, timeout_sec=None, cache=None, on_event=None):
+        """
+        Initialize the job.
+
+        Args:
+            n (int): Size of the grid.
+            M2 (Kripke): The Kripke structure.
+            k (int): Length of the path.
+            bmc (IncrementalSolver): Incremental solver to reuse across bounds, or None to solve from scratch.
+            timeout_sec (float): Timeout of the whole job in seconds from its start, or None for no timeout.
+            cache (ResultCache): Cache of the results, checked before solving and updated after, or None.
+            on_event (callable): Subscriber of the progress events (see emit), or None. The events of an
+                incremental solver go to its own subscriber, JOB_FINISHED is sent here.
+        """
+        self.n = n
+        self.M2 = M2
+        self.k = k
+        self.bmc = bmc
+        self.timeout_sec = timeout_sec
+        self.cache = cache
+        self.on_event = on_event
+        self.ctx = bmc.ctx if bmc is not None else Context()
+        self.stop_event = Event()
+        self.deadline = None
+        self.status = "running"
+        self.result = None
+        self.thread = Thread(target=self.run, daemon=True)
+
+    def start(self):
+        """
+        Start the job.
+
+        Returns:
+            SolverJob: The job itself.
+        """
+        if self.timeout_sec is not None:
+            self.deadline = time.monotonic() + self.timeout_sec
+        if self.k < (2 * self.n) - 1:
+            self.finish((unsat, []))
+        else:
+            self.thread.start()
+        return self
+
+    def run(self):
+        """
+        Run the solver, on the job's thread, unless the result is cached.
+        """
+        cached = self.cache.get(self.M2, self.n, self.k) if self.cache is not None else None
+        if cached is not None:
+            self.finish(cached)
+            return
+        if self.bmc is None:
+            res = Solve(self.n, self.M2, self.k, ctx=self.ctx, stop_event=self.stop_event, on_event=self.on_event,
+                        deadline=self.deadline)
+        else:
+            res = self.bmc.solve(self.k, stop_event=self.stop_event, deadline=self.deadline)
+        if self.cache is not None and not self.stop_event.is_set():
+            self.cache.put(self.M2, self.n, self.k, *res)
+        self.finish(res)
+
+    def finish(self, res):
+        """
+        Store the result of the job.
+
+        Args:
+            res (tuple): The status of the solution and the solution itself.
+        """
+        self.result = res
+        if self.stop_event.is_set():
+            self.status = "cancelled"
+        elif res[0] == "timeout":
+            self.status = "timeout"
+        else:
+            self.status = "done"
+        emit(self.on_event, JOB_FINISHED, self.k, status=self.status)
+
+    def cancel(self):
+        """
+        Cancel the job: the thread stops before the next time step it would encode, or interrupts the running
+        check.
+        """
+        self.stop_event.set()
+        if self.bmc is not None:
+            self.bmc.interrupt()
+        else:
+            self.ctx.interrupt()
+
+    def is_alive(self):
+        """
+        Check whether the job is still running.
+
+        Returns:
+            bool: True if the job is running, False otherwise.
+        """
+        return self.thread.is_alive()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the job to finish.
+
+        Args:
+            timeout (float): Maximum time to wait in seconds, or None to wait until it finishes.
+
+        Returns:
+            tuple: The result of the job, or None if it is still running.
+        """
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+        return self.result
+
+
+def run_solver_on_thread(n, M2, k, bmc=None, timeout_sec=None, cache=None, on_event=None):
+    """
+        Run the solver on a separate thread with a specified timeout.
+
+        Args:
+            n (int): Size of the grid.
+            M2 (Kripke): The Kripke structure.
+            k (int): Length of the path.
+            bmc (IncrementalSolver): Incremental solver to reuse across bounds, or None to solve from scratch.
+            timeout_sec (float): Timeout of the whole job in seconds, or None for no timeout.
+            cache (ResultCache): Cache of the results, checked before solving and updated after, or None.
+            on_event (callable): Subscriber of the progress events (see emit), or None.
+
+        Returns:
+            SolverJob: The started job running the solver.
+        """
+    return SolverJob(n, M2, k, bmc, timeout_sec, cache, on_event).start()
 
 
 def parse_string_to_tuple(input_string):
@@ -6,19 +6,22 @@ from PyQt5.QtWidgets import QVBoxLayout, QLabel, \
 
 from LoadingView import LoadingWindow
 from Services.FileManager import system_to_file
+from Services.KripkeGenerator import generate_from_system
 
 
 class SystemView(QWidget):
     """
     Widget for configuring and visualizing a system.
     """
-    def __init__(self, kripke, parent):
+    def __init__(self, kripke, parent, system=None, n=None):
         """
         Initialize the SystemView widget.
 
         Args:
-            kripke: The Kripke structure representing the system.
+            kripke: The Kripke structure representing the system, or None to generate it when first needed.
             parent: The parent widget.
+            system (System): The robots of the system, or None if only the Kripke structure is known.
+            n (int): The size of the grid, or None for the size of the Kripke structure.
         """
         super().__init__()
 
@@ -29,10 +32,24 @@ class SystemView(QWidget):
         self.ax = None
         self.fig = None
         self.parent = parent
-        self.kripke = kripke
+        self._kripke = kripke
+        self.system = system
+        self.n = n if n is not None else kripke.n
         self.parent.window.setGeometry(100,100,400,150)
         self.initUI()
 
+    @property
+    def kripke(self):
+        """
+        Get the Kripke structure of the system, generating it from the robots on first access.
+
+        Returns:
+            Kripke: The Kripke structure.
+        """
+        if self._kripke is None:
+            self._kripke = generate_from_system(self.system, self.n)
+        return self._kripke
+
     def initUI(self):
         """
         Initialize the user interface elements.
@@ -116,14 +133,14 @@ class SystemView(QWidget):
         try:
             timeout_sec = int(timeout)
             max_k_iterations = int(max_k)
-            if timeout_sec < 1 or max_k_iterations < 1 or max_k_iterations < ((2 * self.kripke.n) - 1):
+            if timeout_sec < 1 or max_k_iterations < 1 or max_k_iterations < ((2 * self.n) - 1):
                 raise ValueError()
         except:
             QMessageBox.warning(self, "Invalid Input", "timeout and max iterations max be a positive integer\nmax "
-                                                       "iterations must be at least " + str(self.kripke.n * 2 - 1))
+                                                       "iterations must be at least " + str(self.n * 2 - 1))
             return
 
-        LView = LoadingWindow(self.kripke.n, self.kripke, timeout_sec, max_k_iterations, self.parent)
+        LView = LoadingWindow(self.n, self.kripke, timeout_sec, max_k_iterations, self.parent)
         self.parent.window.setCentralWidget(LView)
 
     def save_file_dialog(self):
@@ -138,7 +155,8 @@ class SystemView(QWidget):
 
         if file_dialog.exec_() == QFileDialog.Accepted:
             file_path = file_dialog.selectedFiles()[0]
-            system_to_file(file_path, self.kripke)
+            # The robots are enough to generate the Kripke structure again, which is only stored for legacy systems
+            system_to_file(file_path, self.system, self.n, self.kripke if self.system is None else None)
 
     def kripke_present(self):
         """
@@ -150,7 +168,7 @@ class SystemView(QWidget):
         self.ax.set_title('Click a Node to view the safety matrix')
         G = nx.DiGraph()
         for node in self.kripke.nodes:
-            G.add_node(node.node_id, properties_str=self.generate_2d_array_string(node.properties))
+            G.add_node(node.node_id, properties_str=self.generate_2d_array_string(node))
             for t in self.kripke.relations:
                 for e in self.kripke.relations[t]:
                     G.add_edge(t, e)
@@ -173,21 +191,19 @@ class SystemView(QWidget):
             factor = 1.0 / factor
         self.scale(factor, factor)
 
-    def generate_2d_array_string(self, matrix):
+    def generate_2d_array_string(self, node):
         """
-        Generate a string representation of a 2D matrix.
+        Generate a string representation of the occupied cells of a node.
 
         Args:
-            matrix: The input matrix.
+            node: The Kripke node.
 
         Returns:
-            str: A string representation of the matrix.
+            str: A string representation of the occupied cells.
         """
         result = ""
-        for row_index, row in enumerate(matrix):
-            for col_index, value in enumerate(row):
-                if value:
-                    result += f"({row_index},{col_index})\n"
+        for row_index, col_index in node.occupied_cells():
+            result += f"({row_index},{col_index})\n"
         return result
 
     def on_click(self, event):
@@ -213,7 +229,7 @@ class SystemView(QWidget):
             node_id: The ID of the clicked node.
         """
         matrix_string = f"Safety Matrix for {node_id}:\n"
-        matrix_string += self.generate_2d_array_string(self.kripke.nodes[node_id].properties)
+        matrix_string += self.generate_2d_array_string(self.kripke.nodes[node_id])
 
         # Remove the previous text artist if it exists
         if hasattr(self, 'text_artist') and self.text_artist:
@@ -1,11 +1,14 @@
 import math
 
 import PyQt5
+import numpy as np
 from PyQt5.QtCore import QPoint, QPointF, QLineF
 from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QPolygonF, QPolygon, QPainterPath, QTransform
 from PyQt5.QtWidgets import QWidget
 from PyQt5.uic.properties import QtGui
 
+from Services.Playback import OCCUPIED, AGENT, COLLISION
+
 
 class ArrowWidget(QWidget):
     def draw_arrow(self, painter, start_point, end_point):
@@ -50,9 +53,14 @@ class ArrowWidget(QWidget):
         painter.drawEllipse(top_left_x, top_left_y, 2 * radius, 2 * radius)
 
 
+# Fill colors of the cell states of a playback frame (see Services.Playback)
+FRAME_COLORS = {OCCUPIED: QColor(255, 0, 0), AGENT: QColor(0, 120, 215), COLLISION: QColor(0, 0, 0)}
+
+
 class GridDrawerWidget(QWidget):
     def __init__(self, grid_size, width, height):
         super().__init__()
+        self.frame = None
         self.points = []
         self.scol = None
         self.srow = None
@@ -71,6 +79,10 @@ class GridDrawerWidget(QWidget):
 
     def paintEvent(self, event):
         painter = QPainter(self)
+        if self.frame is not None:
+            for rect in event.region().rects():
+                self.draw_frame(painter, rect)
+            return
         self.draw_grid(painter)
         if self.scol is not None and self.srow is not None:
             self.draw_marked_rect(painter)
@@ -98,6 +110,33 @@ class GridDrawerWidget(QWidget):
             else:
                 painter.fillRect(rect_x, rect_y, rect_width, rect_height, QBrush(QColor(255, 0, 0)))
 
+    def draw_frame(self, painter, rect):
+        # Only the cells and grid lines within the exposed rectangle
+        first_row = max(rect.top() // self.cell_height, 0)
+        last_row = min(rect.bottom() // self.cell_height, self.grid_size - 1)
+        first_col = max(rect.left() // self.cell_width, 0)
+        last_col = min(rect.right() // self.cell_width, self.grid_size - 1)
+        block = self.frame[first_row:last_row + 1, first_col:last_col + 1]
+        for row, col in zip(*np.nonzero(block)):
+            painter.fillRect((first_col + col) * self.cell_width, (first_row + row) * self.cell_height,
+                             self.cell_width, self.cell_height, QBrush(FRAME_COLORS[block[row, col]]))
+        for row in range(first_row, last_row + 2):
+            painter.drawLine(first_col * self.cell_width, row * self.cell_height,
+                             (last_col + 1) * self.cell_width, row * self.cell_height)
+        for col in range(first_col, last_col + 2):
+            painter.drawLine(col * self.cell_width, first_row * self.cell_height,
+                             col * self.cell_width, (last_row + 1) * self.cell_height)
+
+    def set_frame(self, frame, changed=None):
+        # Show a playback frame, repainting only the changed cells (flat indexes), or the whole grid if None
+        self.frame = frame
+        if changed is None:
+            self.update()
+            return
+        for cell in changed.tolist():
+            row, col = divmod(cell, self.grid_size)
+            self.update(col * self.cell_width, row * self.cell_height, self.cell_width + 1, self.cell_height + 1)
+
     def mark_rectangle_good(self, row, col):
         self.srow = row
         self.scol = col
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import Analyzer.Batch as Batch
+from Services.FileManager import system_to_file
+from Services.KripkeGenerator import auto_generate_system
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.paths = []
+        for seed in range(3):
+            system, kripke = auto_generate_system(6, 2, 0.3, 2, seed=seed)
+            path = os.path.join(self.directory.name, f"{seed}.sys")
+            system_to_file(path, system, 6, kripke)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_engines_agree(self):
+        for path in self.paths:
+            with self.subTest(path=os.path.basename(path)):
+                record = Batch.solve_file(path, "sat", Batch.GALLOPING, None, None)
+                self.assertIn(record["status"], ("sat", "unsat"))
+                for periodic in (False, True):
+                    graph = Batch.solve_file(path, "graph", Batch.GALLOPING, None, None, periodic)
+                    self.assertEqual((graph["status"], graph["k"]), (record["status"], record["k"]))
+
+    def test_expired_timeout(self):
+        for engine in Batch.ENGINES:
+            with self.subTest(engine=engine):
+                record = Batch.solve_file(self.paths[0], engine, Batch.GALLOPING, None, 0)
+                self.assertEqual(record["status"], "timeout")
+                self.assertIsNone(record["k"])
+
+    def test_overrunning_workers_are_killed(self):
+        jobs = [(path, "graph", Batch.GALLOPING, None, 0.01) for path in self.paths]
+        # Starting a worker alone takes longer than the timeout and the grace period
+        with mock.patch.object(Batch, "GRACE_SEC", 0.05):
+            records = list(Batch.run_jobs(jobs, 2, 0.01, "WARNING"))
+        self.assertEqual(sorted(record["path"] for record in records), self.paths)
+        self.assertEqual({record["status"] for record in records}, {"timeout"})
+        # Reported by the parent, not by the workers
+        self.assertFalse(any("n" in record for record in records))
+
+    def test_run_jobs_without_timeout(self):
+        jobs = [(path, "graph", Batch.GALLOPING, None, None) for path in self.paths]
+        records = {record["path"]: record for record in Batch.run_jobs(jobs, 2, None, "WARNING")}
+        for path in self.paths:
+            expected = Batch.solve_file(path, "graph", Batch.GALLOPING, None, None)
+            self.assertEqual((records[path]["status"], records[path]["k"]), (expected["status"], expected["k"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from Services.FileManager import system_to_file, load_system, close_system, robot_to_bytes, system_hash, LazyNodes
+from Services.KripkeGenerator import auto_generate_system
+
+
+class Shell:
+    def __reduce__(self):
+        return os.system, ("echo unpickled",)
+
+
+class SystemFileTest(unittest.TestCase):
+    def assert_same_kripke(self, loaded, kripke):
+        self.assertEqual(len(loaded.nodes), len(kripke.nodes))
+        self.assertEqual([node.occupancy for node in loaded.nodes], [node.occupancy for node in kripke.nodes])
+        self.assertEqual(loaded.relations, kripke.relations)
+        self.assertEqual((loaded.initial_id, loaded.final_id), (kripke.initial_id, kripke.final_id))
+
+    def test_binary_round_trip(self):
+        for seed in range(3):
+            system, kripke = auto_generate_system(7, 3, 0.3, 2, seed=seed)
+            for lazy in (True, False):
+                for saved_kripke in (kripke, None):
+                    with self.subTest(seed=seed, lazy=lazy, kripke=saved_kripke is not None):
+                        with tempfile.TemporaryDirectory() as directory:
+                            path = os.path.join(directory, "system.sys")
+                            system_to_file(path, system, 7, saved_kripke)
+                            loaded_system, n, loaded = load_system(path, lazy)
+                            self.assertEqual(n, 7)
+                            self.assertEqual([robot_to_bytes(robot) for robot in loaded_system.robots],
+                                             [robot_to_bytes(robot) for robot in system.robots])
+                            self.assertEqual(system_hash(loaded_system, 7), system_hash(system, 7))
+                            if saved_kripke is None:
+                                self.assertIsNone(loaded)
+                            else:
+                                self.assert_same_kripke(loaded, kripke)
+                                close_system(loaded)
+
+    def test_system_hash_ignores_robot_order(self):
+        system, _ = auto_generate_system(7, 3, 0.3, 2, seed=5)
+        reordered, _ = auto_generate_system(7, 3, 0.3, 2, seed=5)
+        reordered.robots.reverse()
+        self.assertEqual(system_hash(reordered, 7), system_hash(system, 7))
+        self.assertNotEqual(system_hash(system, 8), system_hash(system, 7))
+
+    def test_legacy_pickled_file(self):
+        _, kripke = auto_generate_system(6, 2, 0.3, 2, seed=6)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "legacy.sys")
+            with open(path, "wb") as legacy_file:
+                pickle.dump(kripke, legacy_file)
+            system, n, loaded = load_system(path)
+
+        self.assertIsNone(system)
+        self.assertEqual(n, 6)
+        self.assert_same_kripke(loaded, kripke)
+        self.assertEqual([loaded.occupancy_at(t) for t in range(20)], [kripke.occupancy_at(t) for t in range(20)])
+
+    def test_legacy_file_with_other_classes_is_refused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "legacy.sys")
+            with open(path, "wb") as legacy_file:
+                pickle.dump(Shell(), legacy_file)
+            with self.assertRaises(pickle.UnpicklingError):
+                load_system(path)
+
+
+class LazyKripkePickleTest(unittest.TestCase):
+    def test_pickle_lazily_loaded_kripke(self):
+        system, kripke = auto_generate_system(8, 3, 0.3, 2, seed=4)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "system.sys")
+            system_to_file(path, system, 8, kripke)
+            _, n, loaded = load_system(path)
+            self.assertIsInstance(loaded.nodes, LazyNodes)
+
+            restored = pickle.loads(pickle.dumps(loaded))
+
+        self.assertEqual(n, 8)
+        self.assertIsInstance(restored.nodes, list)
+        self.assertEqual([node.occupancy for node in restored.nodes], [node.occupancy for node in kripke.nodes])
+        self.assertEqual(restored.relations, kripke.relations)
+        self.assertEqual([restored.occupancy_at(t) for t in range(20)], [kripke.occupancy_at(t) for t in range(20)])
+
+
+class LazyKripkeCloseTest(unittest.TestCase):
+    def test_close_releases_the_map(self):
+        system, kripke = auto_generate_system(8, 2, 0.3, 2, seed=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "system.sys")
+            system_to_file(path, system, 8, kripke)
+            _, _, loaded = load_system(path)
+            first = loaded.nodes[0]
+            close_system(loaded)
+            os.remove(path)
+
+        self.assertIsNone(loaded.nodes.buffer)
+        self.assertIs(loaded.nodes[0], first)
+        with self.assertRaises(ValueError):
+            loaded.nodes[len(loaded.nodes) - 1]
+
+    def test_save_over_the_loaded_file(self):
+        system, kripke = auto_generate_system(8, 2, 0.3, 2, seed=2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "system.sys")
+            system_to_file(path, system, 8, kripke)
+            loaded_system, _, loaded = load_system(path)
+            system_to_file(path, loaded_system, 8, loaded)
+            _, _, reloaded = load_system(path)
+            occupancies = [node.occupancy for node in reloaded.nodes]
+            close_system(reloaded)
+
+        self.assertIsNone(loaded.nodes.buffer)
+        self.assertEqual(occupancies, [node.occupancy for node in kripke.nodes])
+        self.assertEqual([node.occupancy for node in loaded.nodes], occupancies)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from Models.Kripke import Kripke
+from Models.Node import Node
+
+
+def make_kripke(count, relations, initial_id=0):
+    kripke = Kripke(2)
+    for node_id in range(count):
+        kripke.add_node(Node(node_id, node_id == initial_id, False, 2))
+    for source, target in relations:
+        kripke.add_relation_by_id(source, target)
+    return kripke
+
+
+class KripkeLassoTest(unittest.TestCase):
+    def test_lasso_follows_the_first_successor(self):
+        kripke = make_kripke(4, [(0, 1), (0, 3), (1, 2), (2, 1), (3, 0)])
+        lasso = kripke.lasso()
+        self.assertEqual(lasso.states, [0, 1, 2])
+        self.assertEqual(lasso.loop_start, 1)
+        self.assertEqual([kripke.phase_at(t) for t in range(6)], [0, 1, 2, 1, 2, 1])
+
+    def test_malformed_structures_raise_value_error(self):
+        cases = {
+            "no initial state": make_kripke(2, [(0, 1), (1, 0)], initial_id=None),
+            "state without successor": make_kripke(3, [(0, 1), (1, 2)]),
+            "successor that is not a node": make_kripke(2, [(0, 1), (1, 5)]),
+        }
+        for name, kripke in cases.items():
+            with self.subTest(name):
+                with self.assertRaises(ValueError):
+                    kripke.lasso()
+
+
+if __name__ == "__main__":
+    unittest.main()
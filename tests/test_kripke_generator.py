@@ -0,0 +1,29 @@
+import unittest
+
+from Services.KripkeGenerator import auto_generate_system, generate_periodic_system
+
+
+class PeriodicSystemTest(unittest.TestCase):
+    def assert_same_futures(self, M2, horizon):
+        # Equal phases must be followed by equal occupancies
+        first = {}
+        for t in range(horizon):
+            earlier = first.setdefault(M2.phase_at(t), t)
+            self.assertEqual([M2.occupancy_at(earlier + d) for d in range(horizon)],
+                             [M2.occupancy_at(t + d) for d in range(horizon)])
+
+    def test_periodic_system_matches_kripke(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                system, kripke = auto_generate_system(6, 3, 0.3, 2, seed=seed)
+                periodic = generate_periodic_system(system, 6)
+                # Past both lassos, so the occupancies are equal at every time step
+                horizon = len(kripke.lasso().states) + sum(len(lasso.states) for lasso in periodic.lassos)
+                self.assertEqual([periodic.occupancy_at(t) for t in range(horizon)],
+                                 [kripke.occupancy_at(t) for t in range(horizon)])
+                self.assert_same_futures(kripke, horizon)
+                self.assert_same_futures(periodic, horizon)
+
+
+if __name__ == "__main__":
+    unittest.main()
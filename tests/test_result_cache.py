@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+
+from z3 import sat, unsat
+
+from Models.Kripke import Kripke
+from Models.Node import Node
+from Services.ResultCache import ResultCache, fingerprint, occupancy_lasso
+
+
+def lasso_kripke(n, occupancies, loop_start):
+    # A single run through the occupancies, looping back to loop_start
+    kripke = Kripke(n)
+    for node_id, occupancy in enumerate(occupancies):
+        node = Node(node_id, node_id == 0, False, n)
+        node.occupancy = occupancy
+        kripke.add_node(node)
+    for node_id in range(len(occupancies)):
+        kripke.add_relation_by_id(node_id, node_id + 1 if node_id + 1 < len(occupancies) else loop_start)
+    return kripke
+
+
+class FingerprintTest(unittest.TestCase):
+    def test_equivalent_runs_share_the_canonical_lasso(self):
+        canonical = lasso_kripke(3, [1, 2, 4], 1)
+        equivalents = [
+            lasso_kripke(3, [1, 2, 4, 2, 4], 1),  # Cycle unrolled twice
+            lasso_kripke(3, [1, 2, 4, 2], 2),  # Cycle starting one step later
+            lasso_kripke(3, [1, 2, 4, 2, 4, 2, 4], 3),
+        ]
+        self.assertEqual(occupancy_lasso(canonical), ((1, 2, 4), 1))
+        for kripke in equivalents:
+            with self.subTest(states=[node.occupancy for node in kripke.nodes]):
+                self.assertEqual(occupancy_lasso(kripke), ((1, 2, 4), 1))
+                self.assertEqual(fingerprint(kripke, 3), fingerprint(canonical, 3))
+
+    def test_different_systems_differ(self):
+        canonical = fingerprint(lasso_kripke(3, [1, 2, 4], 1), 3)
+        self.assertNotEqual(fingerprint(lasso_kripke(3, [1, 2, 4], 1), 4), canonical)
+        self.assertNotEqual(fingerprint(lasso_kripke(3, [1, 2, 4], 0), 3), canonical)
+        self.assertNotEqual(fingerprint(lasso_kripke(3, [1, 4, 2], 1), 3), canonical)
+
+    def test_fingerprint_follows_changes(self):
+        kripke = lasso_kripke(3, [1, 2], 0)
+        before = fingerprint(kripke, 3)
+        node = Node(2, False, False, 3)
+        node.occupancy = 8
+        kripke.add_node(node)
+        kripke.relations[1] = set()
+        kripke.add_relation_by_id(1, 2)
+        kripke.add_relation_by_id(2, 0)
+        self.assertNotEqual(fingerprint(kripke, 3), before)
+        self.assertEqual(fingerprint(kripke, 3), fingerprint(lasso_kripke(3, [1, 2, 8], 0), 3))
+
+
+class ResultCacheTest(unittest.TestCase):
+    def test_results_are_shared_by_equivalent_systems_on_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ResultCache(directory=directory).put(lasso_kripke(3, [1, 2, 4], 1), 3, 5, sat,
+                                                 [(0, 0), (0, 1), (1, 1), (2, 1), (2, 2)])
+            ResultCache(directory=directory).put(lasso_kripke(3, [1, 2, 4], 1), 3, 6, "timeout", [])
+            cache = ResultCache(directory=directory)
+            equivalent = lasso_kripke(3, [1, 2, 4, 2, 4], 1)
+            self.assertEqual(cache.get(equivalent, 3, 5), (sat, [(0, 0), (0, 1), (1, 1), (2, 1), (2, 2)]))
+            self.assertIsNone(cache.get(equivalent, 3, 6))
+            self.assertIsNone(cache.get(equivalent, 3, 7))
+            cache.put(equivalent, 3, 7, unsat, [])
+            self.assertEqual(cache.get(lasso_kripke(3, [1, 2, 4], 1), 3, 7), (unsat, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
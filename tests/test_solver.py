@@ -0,0 +1,85 @@
+import unittest
+
+from z3 import sat, unsat
+
+from Services.BoundSearch import find_shortest_path, LINEAR
+from Services.GraphSearch import shortest_path
+from Services.KripkeGenerator import auto_generate_system
+from Services.SatBackend import Z3SatBackend
+from Services.Solver import Solve, IncrementalSolver
+
+N = 5
+MAX_K = 14
+# Seeded systems whose shortest paths take 9 or 10 steps, or that have none
+SEEDS = range(2, 8)
+
+
+def systems():
+    for seed in SEEDS:
+        yield seed, auto_generate_system(N, 4, 0.0, 2, seed=seed)[1]
+
+
+class SolverTest(unittest.TestCase):
+    def assert_valid_path(self, M2, solution, k, within=False):
+        if within:
+            self.assertLessEqual(len(solution), k)
+        else:
+            self.assertEqual(len(solution), k)
+        self.assertEqual(solution[0], (0, 0))
+        self.assertEqual(solution[-1], (N - 1, N - 1))
+        for t, (row, col) in enumerate(solution):
+            self.assertTrue(0 <= row < N and 0 <= col < N)
+            self.assertFalse(M2.occupancy_at(t) >> (row * N + col) & 1, f"collision at step {t}")
+            if t:
+                previous = solution[t - 1]
+                self.assertLessEqual(abs(row - previous[0]) + abs(col - previous[1]), 1)
+
+    def test_cnf_encoding_agrees_with_z3(self):
+        for seed, M2 in systems():
+            for k in range((2 * N) - 1, MAX_K):
+                with self.subTest(seed=seed, k=k):
+                    status, solution = Solve(N, M2, k)
+                    cnf_status, cnf_solution = Solve(N, M2, k, backend=Z3SatBackend())
+                    self.assertEqual(cnf_status, status)
+                    if status == sat:
+                        self.assert_valid_path(M2, solution, k)
+                        self.assert_valid_path(M2, cnf_solution, k)
+
+    def test_incremental_solver_agrees_with_scratch(self):
+        for seed, M2 in systems():
+            bmc = IncrementalSolver(N, M2)
+            for k in range((2 * N) - 1, MAX_K):
+                with self.subTest(seed=seed, k=k):
+                    status, solution = bmc.solve(k)
+                    self.assertEqual(status, Solve(N, M2, k)[0])
+                    if status == sat:
+                        self.assert_valid_path(M2, solution, k)
+
+    def test_within_mode_is_monotonic(self):
+        for seed, M2 in systems():
+            bmc = IncrementalSolver(N, M2, within=True)
+            # Checked out of order, which the within mode allows
+            statuses = {k: bmc.solve(k) for k in reversed(range((2 * N) - 1, MAX_K))}
+            found = [k for k, (status, _) in statuses.items() if status == sat]
+            with self.subTest(seed=seed):
+                if found:
+                    self.assertEqual(found, list(range(min(found), MAX_K))[::-1])
+                for k, (status, solution) in statuses.items():
+                    self.assertEqual(status, Solve(N, M2, k, within=True)[0])
+                    if status == sat:
+                        self.assert_valid_path(M2, solution, k, within=True)
+
+    def test_graph_search_finds_the_sat_minimal_bound(self):
+        for seed, M2 in systems():
+            with self.subTest(seed=seed):
+                status, solution, k = shortest_path(N, M2, MAX_K)
+                sat_status, _, sat_k = find_shortest_path(N, M2, (2 * N) - 1, MAX_K, LINEAR)
+                self.assertEqual(status, sat_status)
+                self.assertIn(status, (sat, unsat))
+                if status == sat:
+                    self.assertEqual(k, sat_k)
+                    self.assert_valid_path(M2, solution, k)
+
+
+if __name__ == "__main__":
+    unittest.main()